@@ -1,10 +1,11 @@
+import heapq
 import random
-import numpy as np
-from datetime import datetime
 import time
+from results_store import ResultsStore
+from travel_times import TravelTimeModel, random_travel_times
 
 class HVSP:
-    def __init__(self, vehicles=1, total_locations=10, shifts=6, patrol_time=5, rest_period=10, shift_lengths=None, iterations=1):
+    def __init__(self, vehicles=1, total_locations=10, shifts=6, patrol_time=5, rest_period=10, shift_lengths=None, iterations=1, shortest_paths=False, cache_dir=None, travel_times=None):
         assert vehicles > 0, "Number of vehicles must be positive"
         assert total_locations > 1, "Number of locations must be greater than 1"
         assert shifts > 0, "Number of shifts must be positive"
@@ -20,30 +21,53 @@ class HVSP:
         self.rest_period = rest_period
         self.shift_lengths = shift_lengths if shift_lengths else [120] * shifts
         self.iterations = iterations
+        self.schedule = None
 
-        self.base_travel_times = self.generate_travel_times()
+        self.travel_model = TravelTimeModel.from_matrix(travel_times if travel_times is not None else self.generate_travel_times(),
+                                                        shortest_paths=shortest_paths, cache_dir=cache_dir)
 
-        self.travel_times = self.base_travel_times.copy()
+    @property
+    def base_travel_times(self):
+        return self.travel_model.base
+
+    @property
+    def travel_times(self):
+        return self.travel_model.current
 
     def generate_travel_times(self):
-        travel_times = {}
-        for i in range(self.total_locations):
-            for j in range(i + 1, self.total_locations):
-                time = np.random.normal(loc=15, scale=2.5)
-                time = max(10, min(20, time)) 
-                travel_times[(i, j)] = time
-                travel_times[(j, i)] = time
-        return travel_times
+        return random_travel_times(self.total_locations, mean=15, scale=2.5, low=10, high=20)
 
     def fluctuate_travel_times(self):
-        for (i, j) in self.base_travel_times:
-            fluctuation = random.choice([-2, 2])
-            self.travel_times[(i, j)] = self.base_travel_times[(i, j)] + fluctuation
-            self.travel_times[(j, i)] = self.travel_times[(i, j)]  # Keep symmetry
+        self.travel_model.fluctuate()
 
     def needs_revisiting(self, current_time, location, last_visit_times, location_locks):
         return (current_time - last_visit_times[location]) >= 30 and (location_locks[location] is None or location_locks[location] <= current_time)
 
+    def revisit_time(self, location, last_visit_times, location_locks):
+        # Earliest time at which needs_revisiting becomes true for the location
+        lock = location_locks[location]
+        return max(last_visit_times[location] + 30, lock if lock is not None else float('-inf'))
+
+    def build_location_index(self, current_time, last_visit_times, location_locks):
+        # ready: heap of (depot travel time, loc) that may be visited now;
+        # waiting: heap of (revisit time, depot travel time, loc) re-admitted as time advances
+        depot_times = self.travel_times[self.first_depot].tolist()
+        ready, waiting = [], []
+        for loc in range(1, self.last_depot):
+            available_at = self.revisit_time(loc, last_visit_times, location_locks)
+            if available_at <= current_time:
+                ready.append((depot_times[loc], loc))
+            else:
+                waiting.append((available_at, depot_times[loc], loc))
+        heapq.heapify(ready)
+        heapq.heapify(waiting)
+        return ready, waiting
+
+    def admit_ready_locations(self, current_time, ready, waiting):
+        while waiting and waiting[0][0] <= current_time:
+            _, depot_time, loc = heapq.heappop(waiting)
+            heapq.heappush(ready, (depot_time, loc))
+
     def initialize_simulation(self):
         routes = {shift: {vehicle: [] for vehicle in range(self.vehicles)} for shift in range(self.shifts)}
         timing_info = {shift: {vehicle: [] for vehicle in range(self.vehicles)} for shift in range(self.shifts)}
@@ -71,14 +95,15 @@ class HVSP:
         timing_info[shift][vehicle].append((self.first_depot, current_time))
         
         travel_time_to_next = 0
+        ready, waiting = self.build_location_index(current_time, last_visit_times, location_locks)
 
         while current_time + self.patrol_time <= end_time:
-            possible_locations = [loc for loc in range(1, self.last_depot)
-                                  if self.needs_revisiting(current_time, loc, last_visit_times, location_locks) and loc not in visited_this_shift]
-            if not possible_locations:
+            # Visited locations are popped for good, so they stay out for the rest of the shift
+            self.admit_ready_locations(current_time, ready, waiting)
+            if not ready:
                 break
 
-            next_location = min(possible_locations, key=lambda loc: self.travel_times[(self.first_depot, loc)])
+            _, next_location = heapq.heappop(ready)
 
             travel_time_to_next = self.travel_times[(self.first_depot, next_location)]
             next_possible_time = current_time + travel_time_to_next + self.patrol_time
@@ -107,15 +132,23 @@ class HVSP:
         total_visits = sum(len(visits) for visits in location_visits.values())
         return unique_visits, total_visits
 
-    def run_simulation(self, last_visit_times, location_locks, is_detailed=False):
+    def simulate(self, verbose=False, is_detailed=False):
+        # One run from an empty visit history; quiet by default for callers that only need the results
+        last_visit_times = {loc: float('-inf') for loc in range(1, self.total_locations)}
+        location_locks = {loc: None for loc in range(1, self.total_locations)}
+        return self.run_simulation(last_visit_times, location_locks, is_detailed=is_detailed, verbose=verbose)
+
+    def run_simulation(self, last_visit_times, location_locks, is_detailed=False, verbose=True):
         routes, timing_info, location_visits, shift_start_time, shift_end_time = self.initialize_simulation()
 
         if random.random() < 0.25:
-            print("Fluctuating travel times for this run.")
+            if verbose:
+                print("Fluctuating travel times for this run.")
             self.fluctuate_travel_times()
         else:
-            print("Keeping travel times constant for this run.")
-            self.travel_times = self.base_travel_times.copy()
+            if verbose:
+                print("Keeping travel times constant for this run.")
+            self.travel_model.reset()
 
         for shift in range(self.shifts):
             for vehicle in range(self.vehicles):
@@ -124,6 +157,9 @@ class HVSP:
                                                                        routes, location_visits)
 
         unique_locations_visited, total_visits = self.evaluate_solution(location_visits)
+        # Same {shift: {vehicle: (route, timings)}} layout as Chromosome.to_dict
+        self.schedule = {shift: {vehicle: (routes[shift][vehicle], timing_info[shift][vehicle]) for vehicle in range(self.vehicles)}
+                         for shift in range(self.shifts)}
 
         if is_detailed:
             self.print_detailed_info(unique_locations_visited, total_visits, routes, timing_info)
@@ -144,15 +180,13 @@ class HVSP:
                     loc_name = f"Location {loc}" if loc != self.first_depot and loc != self.last_depot else f"Depot {loc}"
                     print(f"      {loc_name} at time {time} minutes")
 
-    def write_results_to_file(self, filename, vehicles, shifts, locations, rest_time, average_unique, average_total, execution_time=None):
-        with open(filename, 'a') as file:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file.write(f"Timestamp: {timestamp}\n")
-            file.write(f"{vehicles} vehicles, {shifts} shifts, {locations} locations, {rest_time} rest time => "
-                       f"Average Unique Locations Visited: {average_unique}, Average Total Visits: {average_total}.\n")
-            if execution_time is not None:
-                file.write(f"Execution Time: {execution_time:.2f} seconds\n")
-            file.write("-----\n")
+    @staticmethod
+    def write_results_to_file(filename, vehicles, shifts, locations, rest_time, average_unique, average_total, execution_time=None, variances=None, seed=None):
+        variance_unique, variance_total = variances if variances is not None else (None, None)
+        ResultsStore(filename).append('ahbps', vehicles=vehicles, shifts=shifts, locations=locations, rest_time=rest_time,
+                                      average_unique=average_unique, average_total=average_total,
+                                      variance_unique=variance_unique, variance_total=variance_total,
+                                      execution_time=execution_time, seed=seed)
 
     def main(self):
         test_cases = [
@@ -169,9 +203,7 @@ class HVSP:
             unique_results = []
             total_results = []
             for _ in range(self.iterations):
-                last_visit_times = {loc: float('-inf') for loc in range(1, self.total_locations)}
-                location_locks = {loc: None for loc in range(1, self.total_locations)}
-                unique, total = self.run_simulation(last_visit_times, location_locks)
+                unique, total = self.simulate(verbose=True)
                 unique_results.append(unique)
                 total_results.append(total)
 
@@ -181,12 +213,9 @@ class HVSP:
             end_time = time.time()
             execution_time = end_time - start_time
 
-            self.write_results_to_file('AHBPS_Run_Time_Large_Instance_Nodes_Changes.txt', self.vehicles, self.shifts, self.total_locations, self.rest_period, average_unique, average_total, execution_time)
-
-        last_visit_times_detailed = {loc: float('-inf') for loc in range(1, self.total_locations)}
-        location_locks_detailed = {loc: None for loc in range(1, self.total_locations)}
+            self.write_results_to_file('AHBPS_Run_Time_Large_Instance_Nodes_Changes.jsonl', self.vehicles, self.shifts, self.total_locations, self.rest_period, average_unique, average_total, execution_time)
 
-        unique_locations_visited, total_visits = self.run_simulation(last_visit_times_detailed, location_locks_detailed, is_detailed=True)
+        unique_locations_visited, total_visits = self.simulate(verbose=True, is_detailed=True)
 
 if __name__ == "__main__":
     hvsp = HVSP()
@@ -1,11 +1,17 @@
+import os
+import pickle
 import random
 import numpy as np
-import re
-from datetime import datetime
 import time
+from chromosome import Chromosome, ROUTE_DTYPE, TIME_DTYPE
+from fitness_cache import FitnessCache
+from local_search import LocalSearch
+from results_store import ResultsStore
+from telemetry import ConsoleSink, NullSink, no_clock
+from travel_times import TravelTimeModel, random_travel_times
 
 class GDVPS:
-    def __init__(self, vehicles, locations, shifts=6, population_size=400, generations=500, rest_period=10, patrol_time=5, heuristic_file='/home/majidghasemi/Optimized-Vehicle-Patrol-Scheduling/large_instances/AHBPS_large.txt'):
+    def __init__(self, vehicles, locations, shifts=6, population_size=400, generations=500, rest_period=10, patrol_time=5, heuristic_file='/home/majidghasemi/Optimized-Vehicle-Patrol-Scheduling/large_instances/AHBPS_large.jsonl', cache_size=None, distance_matrix=None, population=None, telemetry=None, shortest_paths=False, cache_dir=None, time_budget=None, checkpoint_file=None, checkpoint_interval=10, local_search=False):
         self.vehicles = vehicles
         self.locations = locations + 1
         self.shifts = shifts
@@ -14,101 +20,200 @@ class GDVPS:
         self.patrol_time = patrol_time
         self.rest_period = rest_period
         self.shift_lengths = [119] * self.shifts
-        self.base_distance_matrix = self.generate_distance_matrix()
-        self.distance_matrix = self.base_distance_matrix.copy()
+        self.route_width = int(max(self.shift_lengths) // self.patrol_time) + 2
+        self.travel_model = TravelTimeModel.from_matrix(distance_matrix if distance_matrix is not None else self.generate_distance_matrix(),
+                                                        shortest_paths=shortest_paths, cache_dir=cache_dir)
+        # Every matrix the travel times take gets its own tag; the base keeps base_version until replan
+        # replaces it, and each fluctuation draws a new, never reused one from last_matrix_version
+        self.base_version = 0
+        self.last_matrix_version = 0
+        self.matrix_version = self.base_version
         self.mutation_rate = 0.1
+        self.stagnation_limit = 25
+        self.sample_attempts = 8
         self.elite_size = int(0.1 * self.population_size)
         self.tournament_size = max(2, int(0.05 * self.locations))
         self.heuristic_solutions = self.load_heuristic_solutions(heuristic_file)
-        self.population = self.initialize_population()
-        self.fitness_cache = {}
+        self.population = population if population is not None else self.initialize_population()
+        self.fitness_cache = FitnessCache(cache_size or 8 * self.population_size)
+        self.telemetry = telemetry if telemetry is not None else NullSink()
+        self.local_search = LocalSearch(self) if local_search else None
+        self.time_budget = time_budget
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        # Run state lives on the instance so a checkpointed run can be resumed or extended
+        self.generation = 0
+        self.best_solution = None
+        self.best_fitness = float('-inf')
+        self.best_fitnesses = []
+        self.stagnation_count = 0
+
+    @property
+    def base_distance_matrix(self):
+        return self.travel_model.base
+
+    @property
+    def distance_matrix(self):
+        return self.travel_model.current
 
     def generate_distance_matrix(self):
-        matrix = np.random.normal(mu=15, scale=5, size=(self.locations, self.locations))
-        
-        matrix = (matrix + matrix.T) // 2
-        
-        np.fill_diagonal(matrix, 0)
+        # Same distribution as flooring the mean of two N(15, 5) draws
+        return random_travel_times(self.locations, mean=15, scale=5 / np.sqrt(2), integer=True, unreachable=0.3)
 
-        for i in range(self.locations):
-            for j in range(i + 1, self.locations):
-                if random.random() < 0.3:
-                    matrix[i][j] = matrix[j][i] = np.inf
-
-        return matrix
+    def next_matrix_version(self):
+        self.last_matrix_version += 1
+        return self.last_matrix_version
 
     def fluctuate_travel_times(self):
-        for i in range(self.locations):
-            for j in range(i + 1, self.locations):
-                if self.base_distance_matrix[i][j] != np.inf:
-                    fluctuation = random.choice([-2, 2])
-                    self.distance_matrix[i][j] = self.base_distance_matrix[i][j] + fluctuation
-                    self.distance_matrix[j][i] = self.distance_matrix[i][j]
+        self.matrix_version = self.next_matrix_version()
+        self.travel_model.fluctuate()
 
     def load_heuristic_solutions(self, heuristic_file):
+        # Only this instance's AHBPS record is needed; the store's offset index seeks straight to it.
+        # Its run totals are turned into the stops AHBPS averaged per route, which caps the seeded routes.
         heuristic_solutions = {}
-        with open(heuristic_file, 'r') as file:
-            lines = file.readlines()
-            for i in range(0, len(lines), 2):
-                match = re.search(r'(\d+) vehicles, (\d+) shifts, (\d+) locations', lines[i])
-                if match:
-                    vehicles = int(match.group(1))
-                    locations = int(match.group(3))
-                    key = (vehicles, locations)
-                    avg_unique_locations = float(re.search(r'Average Unique Locations Visited: (\d+\.?\d*)', lines[i]).group(1))
-                    heuristic_solutions[key] = avg_unique_locations
+        if heuristic_file is None:
+            return heuristic_solutions
+        key = (self.vehicles, self.locations - 1)
+        record = ResultsStore(heuristic_file).latest(*key, solver='ahbps')
+        if record is None:
+            return heuristic_solutions
+        visits = record['average_total'] if record['average_total'] is not None else record['average_unique']
+        if visits is not None:
+            routes = (record['shifts'] or self.shifts) * self.vehicles
+            heuristic_solutions[key] = max(1, int(round(visits / routes)))
         return heuristic_solutions
 
     def initialize_population(self):
-        population = []
+        # Every route of the population is built in one batch per (shift, vehicle); heuristic-derived
+        # individuals come first and are capped at the stops per route AHBPS achieved for this instance
+        max_stops = np.full(self.population_size, self.route_width - 2)
         heuristic_key = (self.vehicles, self.locations - 1)
-        if (self.vehicles, self.locations - 1) in self.heuristic_solutions:
-            for _ in range(min(10, self.population_size)):
-                individual = {}
-                for shift in range(self.shifts):
-                    shift_routes = {vehicle: [] for vehicle in range(self.vehicles)}
-                    for vehicle in range(self.vehicles):
-                        num_locations = int(self.heuristic_solutions[heuristic_key])
-                        route = [0] + random.sample(range(1, self.locations), num_locations) + [0]
-                        timings = [(loc, 0) for loc in route]
-                        individual[shift] = {vehicle: (route, timings)}
-                population.append(individual)
-
-        remaining_population_size = self.population_size - len(population)
-        for _ in range(remaining_population_size):
-            individual = {}
-            for shift in range(self.shifts):
-                shift_routes = {vehicle: [] for vehicle in range(self.vehicles)}
-                individual[shift] = {vehicle: self.create_feasible_route(shift, shift_routes) for vehicle in range(self.vehicles)}
-                for vehicle in range(self.vehicles):
-                    shift_routes[vehicle] = individual[shift][vehicle][1]
-            population.append(individual)
-
-        return population
-
-    def create_feasible_route(self, shift, shift_routes):
+        if heuristic_key in self.heuristic_solutions:
+            max_stops[:min(10, self.population_size)] = min(self.heuristic_solutions[heuristic_key], self.route_width - 2)
+
+        routes = np.zeros((self.population_size, self.shifts, self.vehicles, self.route_width), dtype=ROUTE_DTYPE)
+        times = np.zeros((self.population_size, self.shifts, self.vehicles, self.route_width), dtype=TIME_DTYPE)
+        lengths = np.zeros((self.population_size, self.shifts, self.vehicles), dtype=ROUTE_DTYPE)
+        # round_trips[i, j]: travel i -> j plus the way back to the depot, used to end exhausted routes early
+        round_trips = self.distance_matrix + self.distance_matrix[:, 0]
+        round_trips[:, 0] = np.inf
+        np.fill_diagonal(round_trips, np.inf)
+        closest_round_trip = round_trips.min(axis=1)
+        for shift in range(self.shifts):
+            occupied = np.empty(0, dtype=np.int64)
+            for vehicle in range(self.vehicles):
+                routes[:, shift, vehicle], times[:, shift, vehicle], lengths[:, shift, vehicle], keys = \
+                    self.build_routes(shift, max_stops, occupied, round_trips, closest_round_trip)
+                occupied = np.sort(np.concatenate([occupied, keys]))
+
+        return [Chromosome(routes[i], times[i], lengths[i]) for i in range(self.population_size)]
+
+    def occupancy_keys(self, owners, locations, arrival_times):
+        # Hash of (owner, location, arrival time); a collision only costs a rejected candidate
+        times = np.ascontiguousarray(arrival_times, dtype=np.float64).view(np.int64)
+        return ((owners.astype(np.int64) * self.locations + locations) * 1000003) ^ times
+
+    def is_occupied(self, occupied, keys):
+        if not len(occupied):
+            return np.zeros(keys.shape, dtype=bool)
+        return occupied[np.minimum(np.searchsorted(occupied, keys), len(occupied) - 1)] == keys
+
+    def build_routes(self, shift, max_stops, occupied, round_trips, closest_round_trip):
+        # One route per row, each owned by a different individual; occupied holds the sorted occupancy_keys
+        # of the stops other vehicles of the same individual already make in this shift
+        count = len(max_stops)
+        shift_length = self.shift_lengths[shift]
+        to_depot = self.distance_matrix[:, 0]
+        slots = np.arange(self.route_width)
+        routes = np.zeros((count, self.route_width), dtype=ROUTE_DTYPE)
+        times = np.zeros((count, self.route_width), dtype=TIME_DTYPE)
+        lengths = np.ones(count, dtype=ROUTE_DTYPE)
+        current = np.zeros(count, dtype=np.int64)
+        now = np.zeros(count)
+        active = max_stops > 0
+        keys = []
+        active &= closest_round_trip[0] + self.patrol_time <= shift_length
+
+        while active.any():
+            live = np.flatnonzero(active)
+            candidates = np.random.randint(1, self.locations, size=(len(live), self.sample_attempts))
+            arrivals = now[live, None] + self.distance_matrix[current[live, None], candidates] + self.patrol_time
+            eligible = arrivals + to_depot[candidates] <= shift_length
+            recent = ((routes[live, None, :] == candidates[..., None])
+                      & (arrivals[..., None] - times[live, None, :] <= 30)
+                      & (slots < lengths[live, None, None]))
+            eligible &= ~recent.any(axis=-1)
+            eligible &= ~self.is_occupied(occupied, self.occupancy_keys(live[:, None], candidates, arrivals))
+            pick = eligible.argmax(axis=1)
+            found = eligible[np.arange(len(live)), pick]
+            next_locations = candidates[np.arange(len(live)), pick]
+            next_times = arrivals[np.arange(len(live)), pick]
+
+            if not found.all():
+                # Cheap draws missed: pick uniformly among the still-eligible locations of those rows
+                missed = np.flatnonzero(~found)
+                rows = live[missed]
+                full_eligible = round_trips[current[rows]] <= (shift_length - self.patrol_time) - now[rows, None]
+                stop_rows, stop_slots = np.nonzero(slots < lengths[rows, None])
+                stop_locations = routes[rows[stop_rows], stop_slots]
+                stop_arrivals = now[rows[stop_rows]] + self.distance_matrix[current[rows[stop_rows]], stop_locations] + self.patrol_time
+                revisit = stop_arrivals - times[rows[stop_rows], stop_slots] <= 30
+                full_eligible[stop_rows[revisit], stop_locations[revisit]] = False
+                open_rows = np.flatnonzero(full_eligible.any(axis=1))
+                # Take the k-th eligible location of each open row for a uniform random k
+                counts = np.cumsum(full_eligible[open_rows], axis=1, dtype=np.int32)
+                picks = (np.random.random(len(open_rows)) * counts[:, -1]).astype(np.int32)
+                choice = (counts <= picks[:, None]).sum(axis=1)
+                choice_times = now[rows[open_rows]] + self.distance_matrix[current[rows[open_rows]], choice] + self.patrol_time
+                free = ~self.is_occupied(occupied, self.occupancy_keys(rows[open_rows], choice, choice_times))
+                found[missed[open_rows]] = free
+                next_locations[missed[open_rows]] = choice
+                next_times[missed[open_rows]] = choice_times
+
+            active[live[~found]] = False
+            moved = live[found]
+            routes[moved, lengths[moved]] = next_locations[found]
+            times[moved, lengths[moved]] = next_times[found]
+            lengths[moved] += 1
+            current[moved] = next_locations[found]
+            now[moved] = next_times[found]
+            keys.append(self.occupancy_keys(moved, next_locations[found], next_times[found]))
+            active &= (lengths - 1 < max_stops) & (now + closest_round_trip[current] + self.patrol_time <= shift_length)
+
+        returning = np.flatnonzero(current != 0)
+        routes[returning, lengths[returning]] = 0
+        times[returning, lengths[returning]] = now[returning] + to_depot[current[returning]]
+        lengths[returning] += 1
+        return routes, times, lengths, np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+
+    def occupy(self, occupied, route, times):
+        for loc, arrival_time in zip(route, times):
+            if loc != 0:
+                occupied.setdefault(loc, set()).add(arrival_time)
+
+    def occupancy_index(self, individual, shift):
+        # location -> arrival times already taken by some vehicle in this shift
+        occupied = {}
+        for vehicle in range(self.vehicles):
+            self.occupy(occupied, individual.route(shift, vehicle).tolist(), individual.arrival_times(shift, vehicle).tolist())
+        return occupied
+
+    def create_feasible_route(self, shift, occupied=None):
+        occupied = occupied if occupied is not None else {}
         route = [0]
         current_location = 0
         current_time = 0
-        route_timings = [(current_location, current_time)]
+        route_times = [current_time]
         visited_times = {0: current_time}
 
-        while current_time < self.shift_lengths[shift]:
-            next_location = random.randint(1, self.locations - 1)
-            travel_time = self.distance_matrix[current_location][next_location]
-            arrival_time = current_time + travel_time + self.patrol_time
-
-            if any(arrival_time == other_time for other_route in shift_routes.values() for loc, other_time in other_route if loc == next_location):
-                continue
-
-            if next_location in visited_times and arrival_time - visited_times[next_location] <= 30:
-                continue
-
-            if arrival_time + self.distance_matrix[next_location][0] > self.shift_lengths[shift]:
+        while current_time < self.shift_lengths[shift] and len(route) < self.route_width - 1:
+            next_location, arrival_time = self.sample_next_location(shift, current_location, current_time, visited_times, occupied)
+            if next_location is None:
                 break
 
             route.append(next_location)
-            route_timings.append((next_location, arrival_time))
+            route_times.append(arrival_time)
             visited_times[next_location] = arrival_time
             current_location = next_location
             current_time = arrival_time
@@ -116,159 +221,431 @@ class GDVPS:
         if current_location != 0 and current_time + self.distance_matrix[current_location][0] <= self.shift_lengths[shift]:
             route.append(0)
             current_time += self.distance_matrix[current_location][0]
-            route_timings.append((0, current_time))
-
-        return (route, route_timings)
+            route_times.append(current_time)
+
+        return (route, route_times)
+
+    def is_eligible(self, shift, location, arrival_time, visited_times, occupied):
+        if location in visited_times and arrival_time - visited_times[location] <= 30:
+            return False
+        if arrival_time + self.distance_matrix[location][0] > self.shift_lengths[shift]:
+            return False
+        return arrival_time not in occupied.get(location, ())
+
+    def sample_next_location(self, shift, current_location, current_time, visited_times, occupied):
+        travel_times = self.distance_matrix[current_location]
+        for _ in range(self.sample_attempts):
+            location = random.randint(1, self.locations - 1)
+            arrival_time = current_time + travel_times[location] + self.patrol_time
+            if self.is_eligible(shift, location, arrival_time, visited_times, occupied):
+                return location, arrival_time
+
+        # Cheap draws kept missing: draw from the locations that are still eligible, with a bounded budget
+        arrival_times = current_time + travel_times + self.patrol_time
+        eligible = arrival_times + self.distance_matrix[:, 0] <= self.shift_lengths[shift]
+        eligible[0] = False
+        for location, visit_time in visited_times.items():
+            if arrival_times[location] - visit_time <= 30:
+                eligible[location] = False
+        candidates = np.flatnonzero(eligible)
+        for _ in range(min(self.sample_attempts, len(candidates))):
+            location = int(candidates[random.randrange(len(candidates))])
+            arrival_time = arrival_times[location]
+            if arrival_time not in occupied.get(location, ()):
+                return location, arrival_time
+        return None, None
 
     def evaluate_fitness(self, individual):
-        ind_str = str(individual)
-        if ind_str in self.fitness_cache:
-            return self.fitness_cache[ind_str]
-        
-        unique_locations = set()
-        total_distance = 0
-        for shift in individual:
-            for vehicle in individual[shift]:
-                route, _ = individual[shift][vehicle]
-                unique_locations.update(route)
-                total_distance += sum(self.distance_matrix[route[i]][route[i+1]] for i in range(len(route) - 1))
-        fitness = len(unique_locations)
-        self.fitness_cache[ind_str] = fitness
-        return fitness
+        return int(self.evaluate_population([individual])[0])
+
+    def evaluate_population(self, population, with_distance=False):
+        # The cache holds each genome's visit counters and, when current, its route distance subtotals.
+        # Children carrying counters from their parents are scored incrementally and only recorded in the
+        # cache, so repeated genomes still show up as hits; unscored individuals found there get the
+        # cached counters attached, so their offspring keep scoring incrementally.
+        self.fitness_cache.set_version(self.matrix_version)
+        missing = []
+        for i, individual in enumerate(population):
+            key = individual.key()
+            cached = self.fitness_cache.get(key)
+            if individual.scored:
+                if cached is None:
+                    current = individual.distance_version == self.matrix_version
+                    self.fitness_cache.put(key, (individual.visits.copy(), individual.route_distances.copy() if current else None))
+            elif cached is None:
+                missing.append(i)
+            else:
+                visits, route_distances = cached
+                if route_distances is None:
+                    individual.attach_scores(visits.copy(), np.full((self.shifts, self.vehicles), np.nan), None)
+                else:
+                    individual.attach_scores(visits.copy(), route_distances.copy(), self.matrix_version)
+
+        if missing:
+            visits, route_distances = self.score_population([population[i] for i in missing])
+            for row, i in enumerate(missing):
+                population[i].attach_scores(visits[row].copy(), route_distances[row].copy(), self.matrix_version)
+                self.fitness_cache.put(population[i].key(), (visits[row].copy(), route_distances[row].copy()))
+
+        fitness = np.array([individual.fitness for individual in population])
+        if not with_distance:
+            return fitness
+        return fitness, np.array([individual.total_distance(self.distance_matrix, self.matrix_version) for individual in population])
+
+    def score_population(self, population):
+        routes = np.stack([individual.routes for individual in population])
+        lengths = np.stack([individual.lengths for individual in population])
+        mask = np.arange(self.route_width) < lengths[..., None]
+        size = len(population)
+
+        # Offset every stop by its owner's row so one bincount yields a (size, locations) visit table
+        owners = np.broadcast_to(np.arange(size).reshape(size, 1, 1, 1), routes.shape)
+        visits = np.bincount((owners[mask] * self.locations + routes[mask]).astype(np.int64),
+                             minlength=size * self.locations).reshape(size, self.locations).astype(np.int32)
+
+        legs = mask[..., 1:]
+        leg_distances = np.where(legs, self.distance_matrix[routes[..., :-1], routes[..., 1:]], 0)
+        return visits, leg_distances.sum(axis=-1)
+
+    def top_indices(self, fitness, count):
+        if count < len(fitness):
+            candidates = np.argpartition(-fitness, count - 1)[:count]
+        else:
+            candidates = np.arange(len(fitness))
+        return candidates[np.argsort(-fitness[candidates], kind='stable')]
 
     def crossover(self, parent1, parent2):
-        child = {}
-        for shift in range(self.shifts):
-            child[shift] = {}
-            for vehicle in range(self.vehicles):
-                if random.random() > 0.5:
-                    if vehicle in parent1[shift]:
-                        child[shift][vehicle] = parent1[shift][vehicle]
-                else:
-                    if vehicle in parent2[shift]:
-                        child[shift][vehicle] = parent2[shift][vehicle]
-            for vehicle in range(self.vehicles):
-                if vehicle not in child[shift]:
-                    child[shift][vehicle] = self.create_feasible_route(shift, {})
+        take_first = (np.random.random((self.shifts, self.vehicles)) > 0.5)
+        child = Chromosome(np.where(take_first[..., None], parent1.routes, parent2.routes),
+                           np.where(take_first[..., None], parent1.times, parent2.times),
+                           np.where(take_first, parent1.lengths, parent2.lengths))
+        child.inherit_scores(parent1, parent2, ~take_first)
+        occupied = {}
+        for shift, vehicle in zip(*np.nonzero(child.lengths == 0)):
+            # One index per shift, extended with each fallback route so later ones avoid its arrivals too
+            if shift not in occupied:
+                occupied[shift] = self.occupancy_index(child, shift)
+            route, times = self.create_feasible_route(shift, occupied[shift])
+            child.set_route(shift, vehicle, route, times)
+            self.occupy(occupied[shift], route, times)
         return child
 
     def mutate(self, individual):
-        for shift in individual.values():
-            for vehicle_data in shift.values():
-                route, timings = vehicle_data
-                if random.random() < self.mutation_rate:
-                    if len(route) > 3:
-                        idx1, idx2 = random.sample(range(1, len(route) - 2), 2)
-                        route[idx1], route[idx2] = route[idx2], route[idx1]
+        lengths = individual.lengths
+        mutated = (np.random.random(lengths.shape) < self.mutation_rate) & (lengths > 4)
+        for shift, vehicle in zip(*np.nonzero(mutated)):
+            idx1, idx2 = random.sample(range(1, lengths[shift, vehicle] - 2), 2)
+            individual.swap_stops(shift, vehicle, idx1, idx2)
 
-    def select_parents(self):
-        return self.tournament_selection(), self.tournament_selection()
+    def select_parents(self, fitness):
+        return self.tournament_selection(fitness), self.tournament_selection(fitness)
 
-    def tournament_selection(self):
-        tournament = random.sample(self.population, self.tournament_size)
-        return max(tournament, key=self.evaluate_fitness)
+    def tournament_selection(self, fitness):
+        tournament = np.array(random.sample(range(len(self.population)), self.tournament_size))
+        return self.population[tournament[np.argmax(fitness[tournament])]]
 
     def run(self):
-        best_fitnesses = []
-        best_solution = None
-        best_fitness = float('-inf')
-        stagnation_count = 0
-
-        for generation in range(self.generations):
-            self.distance_matrix = self.base_distance_matrix.copy()
-
-            if random.random() < 0.5:
-                print("Fluctuating travel times for this run.")
+        telemetry = self.telemetry.enabled
+        clock = time.perf_counter if telemetry else no_clock
+        # With a time budget, a generation is only started if the previous one would still fit before the deadline
+        deadline = time.monotonic() + self.time_budget if self.time_budget is not None else None
+        generation_time = 0.0
+        reason = None
+
+        while self.generation < self.generations:
+            if deadline is not None and time.monotonic() + generation_time > deadline:
+                reason = 'time_budget'
+                break
+            generation_start = time.monotonic()
+            timings = dict.fromkeys(('fluctuation', 'evaluation', 'elite_sorting', 'local_search', 'selection', 'crossover', 'mutation', 'survivor_sorting'), 0.0)
+            cache_hits, cache_misses = self.fitness_cache.hits, self.fitness_cache.misses
+
+            start = clock()
+            self.travel_model.reset()
+            self.matrix_version = self.base_version
+            fluctuated = random.random() < 0.5
+            if fluctuated:
                 self.fluctuate_travel_times()
-            else:
-                print("Keeping travel times constant for this run.")
-
-            new_population = []
-            elite_individuals = sorted(self.population, key=self.evaluate_fitness, reverse=True)[:self.elite_size]
-            new_population.extend(elite_individuals)
+            mark = clock()
+            timings['fluctuation'] += mark - start
+
+            fitness = self.evaluate_population(self.population)
+            start, mark = mark, clock()
+            timings['evaluation'] += mark - start
+            elite_indices = self.top_indices(fitness, self.elite_size)
+            new_population = [self.population[i] for i in elite_indices]
+            start, mark = mark, clock()
+            timings['elite_sorting'] += mark - start
+            if self.local_search is not None:
+                # Elites are improved as copies: an elite may be the best_solution an earlier run() returned
+                for position, i in enumerate(elite_indices):
+                    improved = self.population[i].copy()
+                    if self.local_search.improve(improved):
+                        self.population[i] = new_population[position] = improved
+                        fitness[i] = improved.fitness
+                start, mark = mark, clock()
+                timings['local_search'] += mark - start
 
             while len(new_population) < self.population_size:
-                parent1, parent2 = self.select_parents()
+                parent1, parent2 = self.select_parents(fitness)
+                start, mark = mark, clock()
+                timings['selection'] += mark - start
                 child1 = self.crossover(parent1, parent2)
                 child2 = self.crossover(parent2, parent1)
+                start, mark = mark, clock()
+                timings['crossover'] += mark - start
                 self.mutate(child1)
                 self.mutate(child2)
                 new_population.append(child1)
                 new_population.append(child2)
-
-            self.population = sorted(new_population, key=self.evaluate_fitness, reverse=True)[:self.population_size]
-
-            current_best_fitness = self.evaluate_fitness(self.population[0])
-            best_fitnesses.append(current_best_fitness)
-
-            if current_best_fitness > best_fitness:
-                best_fitness = current_best_fitness
-                best_solution = self.population[0]
-                stagnation_count = 0
+                start, mark = mark, clock()
+                timings['mutation'] += mark - start
+
+            new_fitness = np.concatenate([fitness[elite_indices], self.evaluate_population(new_population[len(elite_indices):])])
+            start, mark = mark, clock()
+            timings['evaluation'] += mark - start
+            survivors = np.argsort(-new_fitness, kind='stable')[:self.population_size]
+            self.population = [new_population[i] for i in survivors]
+            start, mark = mark, clock()
+            timings['survivor_sorting'] += mark - start
+
+            current_best_fitness = int(new_fitness[survivors[0]])
+            self.best_fitnesses.append(current_best_fitness)
+            self.generation += 1
+
+            if current_best_fitness > self.best_fitness:
+                self.best_fitness = current_best_fitness
+                self.best_solution = self.population[0]
+                self.stagnation_count = 0
             else:
-                stagnation_count += 1
+                self.stagnation_count += 1
 
-            print(f"Generation {generation + 1}, Best Fitness: {current_best_fitness}, Stagnation Count: {stagnation_count}")
+            if telemetry:
+                self.telemetry.emit({'event': 'generation', 'generation': self.generation, 'best_fitness': current_best_fitness,
+                                     'stagnation_count': self.stagnation_count, 'fluctuated': fluctuated, 'timings': timings,
+                                     'cache_hits': self.fitness_cache.hits - cache_hits,
+                                     'cache_misses': self.fitness_cache.misses - cache_misses,
+                                     'diversity': self.diversity()})
 
-            if stagnation_count >= 25:
-                print(f"Terminating early at generation {generation + 1} due to lack of improvement.")
+            if self.stagnation_count >= self.stagnation_limit:
+                reason = 'stagnation'
                 break
-
-        return best_solution, best_fitness, best_fitnesses
-
-    def write_results_to_file(self, filename, vehicles, locations, shifts, best_fitness, average_fitness, execution_time=None):
-        with open(filename, 'a') as file:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            file.write(f"Timestamp: {timestamp}\n")
-            file.write(f"{vehicles} vehicles, {shifts} shifts, {locations} locations => Best fitness (distinct locations visited): {best_fitness}, Average fitness: {average_fitness}\n")
-            if execution_time is not None:
-                file.write(f"Execution Time: {execution_time:.2f} seconds\n")
-            file.write("-----\n")
+            if self.checkpoint_file is not None and self.generation % self.checkpoint_interval == 0:
+                self.save_checkpoint(self.checkpoint_file)
+            generation_time = time.monotonic() - generation_start
+
+        if self.best_solution is None:
+            # The budget ran out before a single generation; fall back to the best initial individual
+            fitness = self.evaluate_population(self.population)
+            best = int(np.argmax(fitness))
+            self.best_solution, self.best_fitness = self.population[best], int(fitness[best])
+        if self.checkpoint_file is not None:
+            self.save_checkpoint(self.checkpoint_file)
+        if reason is not None and telemetry:
+            self.telemetry.emit({'event': 'terminated', 'generation': self.generation, 'best_fitness': self.best_fitness,
+                                 'reason': reason})
+
+        return self.best_solution, self.best_fitness, self.best_fitnesses
+
+    def extend(self, generations):
+        # Continues a finished (or resumed) run for more generations, giving it a fresh stagnation allowance
+        self.generations = self.generation + generations
+        self.stagnation_count = 0
+        return self.run()
+
+    def replan(self, changes, population=None, generations=50, time_budget=None, stagnation_limit=10):
+        # Warm start after a traffic update: changes is a new base matrix or a sparse {(i, j): travel_time}
+        # mapping. The previous population (this instance's by default) is repaired against the new travel
+        # times and evolution continues from it instead of from initialize_population; starting from an
+        # evolved population, it is allowed to stop sooner on stagnation than a cold run.
+        if self.travel_model.predecessors is None:
+            changed = self.travel_model.update(changes)
+        else:
+            # Multi-hop times depend on the whole road network, so the closure is rebuilt from the new road matrix
+            assert not isinstance(changes, dict), "Shortest-path instances are re-planned from a full road matrix"
+            previous = self.travel_model.base
+            self.travel_model = TravelTimeModel.from_matrix(changes, shortest_paths=True, fluctuation=self.travel_model.fluctuation)
+            changed = self.travel_model.base != previous
+        self.base_version = self.matrix_version = self.next_matrix_version()
+        self.fitness_cache.clear()
+        if self.local_search is not None:
+            self.local_search.build_neighbors()
+
+        # Repair works on copies: the best plan a previous run returned may be the one dispatch is executing
+        self.population = [individual.copy() for individual in (population if population is not None else self.population)]
+        repaired = self.repair_population(self.population, changed)
+        for individual in self.population:
+            individual.invalidate_distances()
+
+        self.best_solution, self.best_fitness, self.best_fitnesses = None, float('-inf'), []
+        self.generation, self.stagnation_count = 0, 0
+        self.generations = generations
+        self.stagnation_limit = stagnation_limit
+        if time_budget is not None:
+            self.time_budget = time_budget
+        if self.telemetry.enabled:
+            self.telemetry.emit({'event': 'replan', 'changed_edges': int(np.count_nonzero(np.triu(changed, 1))),
+                                 'repaired_routes': repaired})
+        return self.run()
+
+    def repair_population(self, population, changed):
+        # Only routes driving over a changed edge are re-timed. A route that can no longer serve a stop in time
+        # (shift end, unreachable leg or the 30-minute revisit rule) is cut before it and sent back to the depot.
+        routes = np.stack([individual.routes for individual in population])
+        lengths = np.stack([individual.lengths for individual in population])
+        mask = np.arange(self.route_width) < lengths[..., None]
+        affected = (changed[routes[..., :-1], routes[..., 1:]] & mask[..., 1:]).any(axis=-1)
+        if not affected.any():
+            return 0
+
+        owners, shifts, vehicles = np.nonzero(affected)
+        routes, mask, lengths = routes[affected], mask[affected], lengths[affected]
+        matrix = self.distance_matrix
+        with np.errstate(invalid='ignore'):
+            leg_times = np.where(mask[:, 1:], matrix[routes[:, :-1], routes[:, 1:]] + np.where(routes[:, 1:] != 0, self.patrol_time, 0), 0)
+            times = np.concatenate([np.zeros((len(routes), 1)), np.cumsum(leg_times, axis=1)], axis=1)
+            late = times + matrix[routes, 0] > np.asarray(self.shift_lengths)[shifts, None]
+            revisits = ((routes[:, :, None] == routes[:, None, :]) & (routes[:, :, None] != 0)
+                        & np.tri(self.route_width, k=-1, dtype=bool) & (times[:, :, None] - times[:, None, :] <= 30))
+        infeasible = (late | revisits.any(axis=2)) & mask
+        cuts = np.where(infeasible.any(axis=1), infeasible.argmax(axis=1), lengths)
+
+        repaired = 0
+        for row, (owner, shift, vehicle) in enumerate(zip(owners, shifts, vehicles)):
+            individual, cut, length = population[owner], cuts[row], lengths[row]
+            if cut == length:
+                individual.times[shift, vehicle, :length] = times[row, :length]
+                continue
+            route, route_times = routes[row, :cut].tolist(), times[row, :cut].tolist()
+            if cut > 1:
+                route_times.append(route_times[-1] + matrix[route[-1], 0])
+                route.append(0)
+            individual.set_route(shift, vehicle, route, route_times)
+            repaired += 1
+        return repaired
+
+    def save_checkpoint(self, path):
+        # Population arrays are stacked so the checkpoint is a handful of numpy buffers rather than one
+        # pickled object per individual; counters are rebuilt (or served from the cache) after resuming
+        population = [individual.copy() for individual in self.population]
+        best = self.best_solution
+        state = {
+            'params': {'vehicles': self.vehicles, 'locations': self.locations - 1, 'shifts': self.shifts,
+                       'population_size': self.population_size, 'generations': self.generations,
+                       'rest_period': self.rest_period, 'patrol_time': self.patrol_time,
+                       'cache_size': self.fitness_cache.max_size, 'time_budget': self.time_budget,
+                       'checkpoint_interval': self.checkpoint_interval, 'local_search': self.local_search is not None},
+            'base_matrix': np.asarray(self.travel_model.base),
+            'predecessors': None if self.travel_model.predecessors is None else np.asarray(self.travel_model.predecessors),
+            'fluctuation': self.travel_model.fluctuation,
+            'shift_lengths': self.shift_lengths,
+            'mutation_rate': self.mutation_rate,
+            'stagnation_limit': self.stagnation_limit,
+            'heuristic_solutions': self.heuristic_solutions,
+            'routes': np.stack([individual.routes for individual in population]),
+            'times': np.stack([individual.times for individual in population]),
+            'lengths': np.stack([individual.lengths for individual in population]),
+            'best_solution': None if best is None else (best.routes, best.times, best.lengths),
+            'best_fitness': self.best_fitness,
+            'best_fitnesses': self.best_fitnesses,
+            'generation': self.generation,
+            'stagnation_count': self.stagnation_count,
+            'matrix_versions': (self.base_version, self.last_matrix_version),
+            'fitness_cache': self.fitness_cache.entries,
+            'rng_state': (random.getstate(), np.random.get_state()),
+        }
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, path)
+        if self.telemetry.enabled:
+            self.telemetry.emit({'event': 'checkpoint', 'generation': self.generation, 'path': path})
+
+    @classmethod
+    def from_checkpoint(cls, path, **overrides):
+        # overrides may change run-level options such as generations, time_budget, telemetry or checkpoint_file
+        with open(path, 'rb') as file:
+            state = pickle.load(file)
+        params = dict(state['params'], **overrides)
+        ga = cls(**params, heuristic_file=None, distance_matrix=state['base_matrix'], population=[])
+        ga.travel_model = TravelTimeModel(state['base_matrix'], state['fluctuation'], state['predecessors'])
+        ga.shift_lengths = state['shift_lengths']
+        ga.mutation_rate = state['mutation_rate']
+        ga.stagnation_limit = state['stagnation_limit']
+        ga.heuristic_solutions = state['heuristic_solutions']
+        ga.population = [Chromosome(routes, times, lengths)
+                         for routes, times, lengths in zip(state['routes'], state['times'], state['lengths'])]
+        if state['best_solution'] is not None:
+            ga.best_solution = Chromosome(*state['best_solution'])
+        ga.best_fitness = state['best_fitness']
+        ga.best_fitnesses = state['best_fitnesses']
+        ga.generation = state['generation']
+        ga.stagnation_count = state['stagnation_count']
+        # Cached entries carry the tags of the interrupted run, so new fluctuations must not reuse them
+        ga.base_version, ga.last_matrix_version = state['matrix_versions']
+        ga.matrix_version = ga.base_version
+        for key, entry in state['fitness_cache'].items():
+            ga.fitness_cache.entries[key] = entry
+        random.setstate(state['rng_state'][0])
+        np.random.set_state(state['rng_state'][1])
+        return ga
+
+    def diversity(self):
+        # Share of structurally distinct individuals in the population
+        return len({individual.key() for individual in self.population}) / len(self.population)
+
+    def write_results_to_file(self, filename, vehicles, locations, shifts, best_fitness, average_fitness, execution_time=None, seed=None):
+        ResultsStore(filename).append('gdvps', vehicles=vehicles, shifts=shifts, locations=locations,
+                                      rest_time=self.rest_period, best_fitness=best_fitness,
+                                      average_fitness=average_fitness, execution_time=execution_time, seed=seed)
 
     def print_travel_details(self, solution):
-        for shift in solution:
+        for shift in range(solution.shifts):
             print(f"Shift {shift + 1}:")
-            for vehicle, (route, timings) in solution[shift].items():
+            for vehicle in range(solution.vehicles):
+                if not solution.has_route(shift, vehicle):
+                    continue
                 print(f"  Vehicle {vehicle + 1}:")
-                for loc, time in timings:
+                for loc, time in solution.timings(shift, vehicle):
                     print(f"    Location {loc}, Time {time}")
                 print("")
 
 
-results_filename = 'GDVPS_Run_Time_Large_Instance_Vehicles_Changes_v2.txt'
+if __name__ == "__main__":
+    results_filename = 'GDVPS_Run_Time_Large_Instance_Vehicles_Changes_v2.jsonl'
 
-VALID_PAIRS = [(15, 1000)]
+    VALID_PAIRS = [(15, 1000)]
 
-for vehicles, locations in VALID_PAIRS:
-    shifts = 6
-    best_overall_solution = None
-    best_overall_fitness = 0
-    total_fitness_across_iterations = 0
-    max_fitness_so_far = float('-inf')
+    for vehicles, locations in VALID_PAIRS:
+        shifts = 6
+        best_overall_solution = None
+        best_overall_fitness = 0
+        total_fitness_across_iterations = 0
+        max_fitness_so_far = float('-inf')
 
-    start_time = time.time()
+        start_time = time.time()
 
-    for i in range(1):
-        ga = GDVPS(vehicles=vehicles, locations=locations, shifts=shifts)
-        best_solution, fitness, best_fitnesses = ga.run()
-        if fitness > max_fitness_so_far:
-            max_fitness_so_far = fitness
+        for i in range(1):
+            ga = GDVPS(vehicles=vehicles, locations=locations, shifts=shifts, telemetry=ConsoleSink())
+            best_solution, fitness, best_fitnesses = ga.run()
+            if fitness > max_fitness_so_far:
+                max_fitness_so_far = fitness
 
-        total_fitness_across_iterations += fitness
+            total_fitness_across_iterations += fitness
 
-        if fitness > best_overall_fitness:
-            best_overall_fitness = fitness
-            best_overall_solution = best_solution
+            if fitness > best_overall_fitness:
+                best_overall_fitness = fitness
+                best_overall_solution = best_solution
 
-    average_fitness_across_iterations = total_fitness_across_iterations / 1
+        average_fitness_across_iterations = total_fitness_across_iterations / 1
 
-    end_time = time.time()
-    execution_time = end_time - start_time
+        end_time = time.time()
+        execution_time = end_time - start_time
 
-    ga.write_results_to_file(results_filename, vehicles, locations, shifts, best_overall_fitness, average_fitness_across_iterations, execution_time)
+        ga.write_results_to_file(results_filename, vehicles, locations, shifts, best_overall_fitness, average_fitness_across_iterations, execution_time)
 
-    print(f"Details for {vehicles} vehicles and {locations} locations:")
-    ga.print_travel_details(best_overall_solution)
-    print("\n" + "-"*50 + "\n")
+        print(f"Details for {vehicles} vehicles and {locations} locations:")
+        ga.print_travel_details(best_overall_solution)
+        print("\n" + "-"*50 + "\n")
 
-print("Automated Genetic Algorithm tests for all valid pairs completed. Results saved to file.")
+    print("Automated Genetic Algorithm tests for all valid pairs completed. Results saved to file.")
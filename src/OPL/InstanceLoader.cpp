@@ -0,0 +1,74 @@
+#include "InstanceLoader.h"
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+
+using std::ifstream;
+using std::string;
+
+// The file is little-endian; like the exporter, this assumes a little-endian host.
+template<typename T>
+static bool readValues(ifstream &file, vector<T> &values, size_t count) {
+    values.resize(count);
+    file.read(reinterpret_cast<char *>(values.data()), static_cast<std::streamsize>(count * sizeof(T)));
+    return static_cast<bool>(file);
+}
+
+bool loadInstance(const string &path, IlpPatrolScheduler &scheduler) {
+    ifstream file(path, std::ios::binary);
+    char magic[8];
+    if (!file.read(magic, sizeof(magic)) || std::memcmp(magic, "PATROL01", sizeof(magic)) != 0) {
+        return false;
+    }
+
+    // locations, depot, Tmax, cars, maxCarVisits, maxLocSessions
+    vector<int32_t> header;
+    if (!readValues(file, header, 6)) {
+        return false;
+    }
+    int locations = header[0];
+    int cars = header[3];
+
+    vector<double> flatTravelTime, taul, taulg, breakStart, breakEnd;
+    vector<int32_t> initialLocations, restTime;
+    if (!readValues(file, flatTravelTime, static_cast<size_t>(locations) * locations)
+        || !readValues(file, taul, locations)
+        || !readValues(file, taulg, locations)
+        || !readValues(file, initialLocations, cars)
+        || !readValues(file, restTime, cars)
+        || !readValues(file, breakStart, cars)
+        || !readValues(file, breakEnd, cars)) {
+        return false;
+    }
+
+    // Pairs without a direct path are stored as inf; they are excluded through the adjacency matrix,
+    // so their travel time is never used and is set to 0 to keep the model's coefficients finite.
+    vector<vector<double>> travelTime(locations, vector<double>(locations, 0));
+    vector<vector<int>> adjMatrix(locations, vector<int>(locations, 0));
+    for (int l1 = 0; l1 < locations; ++l1) {
+        for (int l2 = 0; l2 < locations; ++l2) {
+            double time = flatTravelTime[static_cast<size_t>(l1) * locations + l2];
+            if (l1 != l2 && std::isfinite(time)) {
+                travelTime[l1][l2] = time;
+                adjMatrix[l1][l2] = 1;
+            }
+        }
+    }
+
+    scheduler.setNumberOfLocations(locations);
+    scheduler.setDepot(header[1]);
+    scheduler.setTMax(header[2]);
+    scheduler.setNumberOfCars(cars);
+    scheduler.setMaxCarVisits(header[4]);
+    scheduler.setMaxLocSessions(header[5]);
+    scheduler.setAdjMatrix(adjMatrix);
+    scheduler.setTravelTime(travelTime);
+    scheduler.setTaul(taul);
+    scheduler.setTaulg(taulg);
+    scheduler.setCarsInitialLocations(vector<int>(initialLocations.begin(), initialLocations.end()));
+    scheduler.setResTime(vector<int>(restTime.begin(), restTime.end()));
+    scheduler.setCarsBreakStartTime(breakStart);
+    scheduler.setCarsBreakEndTime(breakEnd);
+    return true;
+}
@@ -0,0 +1,11 @@
+#ifndef PATROLSCHEDULING_INSTANCELOADER_H
+#define PATROLSCHEDULING_INSTANCELOADER_H
+
+#include "IlpPatrolScheduler.h"
+#include <string>
+
+// Reads an instance written by src/milp_export.py (PatrolInstance.write) and passes it to the scheduler's setters.
+// Returns false if the file cannot be read or is not an instance file.
+bool loadInstance(const std::string &path, IlpPatrolScheduler &scheduler);
+
+#endif //PATROLSCHEDULING_INSTANCELOADER_H
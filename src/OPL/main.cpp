@@ -1,11 +1,23 @@
 #include "IlpPatrolScheduler.h"
+#include "InstanceLoader.h"
+#include <iostream>
 
 using namespace std;
 
-int main() {
+int main(int argc, char *argv[]) {
     const auto M = 10000;
     IlpPatrolScheduler scheduler;
 
+    // An instance file exported by src/milp_export.py replaces the built-in example
+    if (argc > 1) {
+        if (!loadInstance(argv[1], scheduler)) {
+            cerr << "Could not read instance file " << argv[1] << endl;
+            return 1;
+        }
+        scheduler.run();
+        return 0;
+    }
+
     vector<vector<int>> adjMatrix = {{0, 1, 1, 1},
                                      {1, 0, 1, 1},
                                      {1, 1, 0, 1},
@@ -0,0 +1,158 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from AHBPS import HVSP
+from GDVPS import GDVPS
+from telemetry import MemorySink
+
+
+def _seed_globals(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark_gdvps(case):
+    _seed_globals(case['seed'])
+    phases = {}
+    sink = MemorySink()
+    start_time = time.perf_counter()
+    ga = GDVPS(vehicles=case['vehicles'], locations=case['locations'], shifts=case['shifts'],
+               population_size=case['population_size'], generations=case['generations'],
+               heuristic_file=None, population=[], telemetry=sink)
+    phases['instance'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    ga.population = ga.initialize_population()
+    phases['initialize'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    _, best_fitness, best_fitnesses = ga.run()
+    phases['evolve'] = time.perf_counter() - start_time
+
+    generations = len(best_fitnesses)
+    for event in sink.events:
+        if event['event'] == 'generation':
+            for phase, elapsed in event['timings'].items():
+                phases[f'evolve.{phase}'] = phases.get(f'evolve.{phase}', 0.0) + elapsed
+    return {'generations': generations, 'generations_per_second': generations / phases['evolve'],
+            'fitness': best_fitness, 'phases': phases}
+
+
+def benchmark_hvsp(case):
+    _seed_globals(case['seed'])
+    phases = {}
+    start_time = time.perf_counter()
+    hvsp = HVSP(vehicles=case['vehicles'], total_locations=case['locations'], shifts=case['shifts'])
+    phases['instance'] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    unique, total = hvsp.simulate()
+    phases['simulate'] = time.perf_counter() - start_time
+
+    return {'fitness': unique, 'total_visits': total, 'phases': phases}
+
+
+SOLVERS = {'gdvps': benchmark_gdvps, 'ahbps': benchmark_hvsp}
+
+
+def run_case(case):
+    start_time = time.perf_counter()
+    result = SOLVERS[case['solver']](case)
+    result['wall_time'] = time.perf_counter() - start_time
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return dict(case, **result)
+
+
+def case_key(case):
+    return (case['solver'], case['vehicles'], case['locations'], case['shifts'], case.get('population_size'))
+
+
+def build_cases(solvers, vehicles, locations, shifts, population_sizes, generations, seed):
+    cases = []
+    for solver in solvers:
+        sizes = population_sizes if solver == 'gdvps' else [None]
+        for v, l, s, p in itertools.product(vehicles, locations, shifts, sizes):
+            case = {'solver': solver, 'vehicles': v, 'locations': l, 'shifts': s, 'seed': seed}
+            if solver == 'gdvps':
+                case.update(population_size=p, generations=generations)
+            cases.append(case)
+    return cases
+
+
+def run_suite(cases):
+    # A fresh spawned process per case keeps peak RSS and allocator state from leaking between cases
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_case, cases):
+            print(f"{result['solver']} v={result['vehicles']} l={result['locations']} s={result['shifts']} "
+                  f"p={result.get('population_size')}: {result['wall_time']:.2f}s, fitness {result['fitness']}, "
+                  f"peak RSS {result['peak_rss_mb']:.0f} MB")
+            results.append(result)
+    return results
+
+
+def compare_to_baseline(results, baseline, time_tolerance=0.2, fitness_tolerance=0.05):
+    baseline_cases = {case_key(case): case for case in baseline['results']}
+    regressions = []
+    for result in results:
+        reference = baseline_cases.get(case_key(result))
+        if reference is None:
+            continue
+        if result['wall_time'] > reference['wall_time'] * (1 + time_tolerance):
+            regressions.append((case_key(result), 'wall_time', reference['wall_time'], result['wall_time']))
+        if result['fitness'] < reference['fitness'] * (1 - fitness_tolerance):
+            regressions.append((case_key(result), 'fitness', reference['fitness'], result['fitness']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for GDVPS and AHBPS")
+    parser.add_argument('--solvers', nargs='+', default=['gdvps', 'ahbps'], choices=sorted(SOLVERS))
+    parser.add_argument('--vehicles', nargs='+', type=int, default=[5, 15])
+    parser.add_argument('--locations', nargs='+', type=int, default=[100, 500, 1000])
+    parser.add_argument('--shifts', nargs='+', type=int, default=[6])
+    parser.add_argument('--population-sizes', nargs='+', type=int, default=[100, 400])
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="previous --output file to compare against")
+    parser.add_argument('--time-tolerance', type=float, default=0.2)
+    parser.add_argument('--fitness-tolerance', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    cases = build_cases(args.solvers, args.vehicles, args.locations, args.shifts, args.population_sizes,
+                        args.generations, args.seed)
+    report = {'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'python': platform.python_version(),
+              'numpy': np.__version__, 'machine': platform.machine(), 'results': run_suite(cases)}
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_to_baseline(report['results'], json.load(file), args.time_tolerance, args.fitness_tolerance)
+        for key, metric, reference, current in regressions:
+            print(f"REGRESSION {key}: {metric} {reference:.3f} -> {current:.3f}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import hashlib
+
+import numpy as np
+
+ROUTE_DTYPE = np.int32
+TIME_DTYPE = np.float64
+PAD = 0
+
+
+class Chromosome:
+    # routes/times are (shifts, vehicles, width) arrays padded with PAD past lengths[shift, vehicle];
+    # a zero length marks a vehicle without a route in that shift.
+    # Once scored, visits holds per-location visit counters and route_distances the per-route
+    # distance subtotals (NaN where a route changed since), so edits only re-score what they touch.
+    __slots__ = ('routes', 'times', 'lengths', '_key', 'visits', 'covered', 'route_distances', 'distance_version')
+
+    def __init__(self, routes, times, lengths):
+        self.routes = routes
+        self.times = times
+        self.lengths = lengths
+        self._key = None
+        self.visits = None
+        self.covered = 0
+        self.route_distances = None
+        self.distance_version = None
+
+    @classmethod
+    def empty(cls, shifts, vehicles, width):
+        return cls(np.full((shifts, vehicles, width), PAD, dtype=ROUTE_DTYPE),
+                   np.zeros((shifts, vehicles, width), dtype=TIME_DTYPE),
+                   np.zeros((shifts, vehicles), dtype=ROUTE_DTYPE))
+
+    @classmethod
+    def from_dict(cls, individual, shifts, vehicles, width):
+        chromosome = cls.empty(shifts, vehicles, width)
+        for shift, shift_routes in individual.items():
+            for vehicle, (route, timings) in shift_routes.items():
+                chromosome.set_route(shift, vehicle, route, [time for _, time in timings])
+        return chromosome
+
+    @property
+    def shifts(self):
+        return self.routes.shape[0]
+
+    @property
+    def vehicles(self):
+        return self.routes.shape[1]
+
+    @property
+    def width(self):
+        return self.routes.shape[2]
+
+    def key(self):
+        # Structural hash of the routes; arrival times do not affect fitness and are left out
+        if self._key is None:
+            digest = hashlib.blake2b(np.ascontiguousarray(self.routes), digest_size=16)
+            digest.update(np.ascontiguousarray(self.lengths))
+            self._key = digest.digest()
+        return self._key
+
+    def mask(self):
+        return np.arange(self.width) < self.lengths[..., None]
+
+    def copy(self):
+        chromosome = Chromosome(self.routes.copy(), self.times.copy(), self.lengths.copy())
+        if self.visits is not None:
+            chromosome.attach_scores(self.visits.copy(), self.route_distances.copy(), self.distance_version)
+        return chromosome
+
+    @property
+    def scored(self):
+        return self.visits is not None
+
+    @property
+    def fitness(self):
+        return self.covered if self.visits is not None else None
+
+    def attach_scores(self, visits, route_distances, distance_version):
+        self.visits = visits
+        self.covered = int(np.count_nonzero(visits))
+        self.route_distances = route_distances
+        self.distance_version = distance_version
+
+    def inherit_scores(self, base, donor, replaced):
+        # self equals base except in the (shift, vehicle) slots flagged by replaced, which were copied from donor
+        if base.visits is None:
+            return
+        removed = base.routes[replaced][base.mask()[replaced]]
+        added = self.routes[replaced][self.mask()[replaced]]
+        self.visits = base.visits.copy()
+        self.covered = base.covered
+        self._update_visits(removed, added)
+        if donor.route_distances is not None and donor.distance_version == base.distance_version:
+            donor_distances = donor.route_distances
+        else:
+            donor_distances = np.nan
+        self.route_distances = np.where(replaced, donor_distances, base.route_distances)
+        self.distance_version = base.distance_version
+
+    def _update_visits(self, removed, added):
+        touched = np.unique(np.concatenate([removed, added]))
+        before = np.count_nonzero(self.visits[touched])
+        np.subtract.at(self.visits, removed, 1)
+        np.add.at(self.visits, added, 1)
+        self.covered += int(np.count_nonzero(self.visits[touched])) - before
+
+    def route_distance_table(self, distance_matrix):
+        legs = self.mask()[..., 1:]
+        return np.where(legs, distance_matrix[self.routes[..., :-1], self.routes[..., 1:]], 0).sum(axis=-1)
+
+    def total_distance(self, distance_matrix, distance_version):
+        if self.route_distances is None or self.distance_version != distance_version:
+            self.route_distances = self.route_distance_table(distance_matrix)
+            self.distance_version = distance_version
+        else:
+            for shift, vehicle in zip(*np.nonzero(np.isnan(self.route_distances))):
+                route = self.route(shift, vehicle)
+                self.route_distances[shift, vehicle] = distance_matrix[route[:-1], route[1:]].sum()
+        return float(self.route_distances.sum())
+
+    def invalidate_distances(self):
+        # The subtotals are kept as a buffer but recomputed in full by the next total_distance call
+        self.distance_version = None
+
+    def has_route(self, shift, vehicle):
+        return self.lengths[shift, vehicle] > 0
+
+    def route(self, shift, vehicle):
+        return self.routes[shift, vehicle, :self.lengths[shift, vehicle]]
+
+    def arrival_times(self, shift, vehicle):
+        return self.times[shift, vehicle, :self.lengths[shift, vehicle]]
+
+    def timings(self, shift, vehicle):
+        return list(zip(self.route(shift, vehicle).tolist(), self.arrival_times(shift, vehicle).tolist()))
+
+    def set_route(self, shift, vehicle, route, times):
+        length = len(route)
+        if length > self.width:
+            raise ValueError(f"Route of {length} stops does not fit chromosome width {self.width}")
+        if self.visits is not None:
+            self._update_visits(self.route(shift, vehicle), np.asarray(route, dtype=ROUTE_DTYPE))
+            self.route_distances[shift, vehicle] = np.nan
+        self.routes[shift, vehicle, :length] = route
+        self.routes[shift, vehicle, length:] = PAD
+        self.times[shift, vehicle, :length] = times
+        self.times[shift, vehicle, length:] = 0
+        self.lengths[shift, vehicle] = length
+        self._key = None
+
+    def swap_stops(self, shift, vehicle, idx1, idx2):
+        route = self.routes[shift, vehicle]
+        route[idx1], route[idx2] = route[idx2], route[idx1]
+        self._key = None
+        if self.route_distances is not None:
+            self.route_distances[shift, vehicle] = np.nan
+
+    def to_dict(self):
+        return {shift: {vehicle: (self.route(shift, vehicle).tolist(), self.timings(shift, vehicle))
+                        for vehicle in range(self.vehicles) if self.has_route(shift, vehicle)}
+                for shift in range(self.shifts)}
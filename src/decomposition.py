@@ -0,0 +1,147 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from AHBPS import HVSP
+from GDVPS import GDVPS
+
+SOLVERS = ('gdvps', 'ahbps')
+
+
+def clustering_distances(matrix):
+    # Unreachable pairs still need a finite cost to be compared; twice the longest finite leg keeps them last
+    distances = np.array(matrix[1:, 1:], dtype=np.float64)
+    finite = np.isfinite(distances)
+    distances[~finite] = 2 * distances[finite].max() if finite.any() else 1.0
+    return distances
+
+
+def k_medoids(distances, zones, rng, iterations=20):
+    # Alternating k-medoids with k-medoids++ seeding; returns the medoids and each location's zone
+    size = distances.shape[0]
+    medoids = [int(rng.integers(size))]
+    closest = distances[medoids[0]].copy()
+    for _ in range(1, zones):
+        weights = closest ** 2
+        total = weights.sum()
+        medoid = int(rng.choice(size, p=weights / total)) if total > 0 else int(rng.integers(size))
+        medoids.append(medoid)
+        np.minimum(closest, distances[medoid], out=closest)
+    medoids = np.array(medoids)
+
+    for _ in range(iterations):
+        assignment = distances[:, medoids].argmin(axis=1)
+        updated = medoids.copy()
+        for zone in range(zones):
+            members = np.flatnonzero(assignment == zone)
+            if len(members):
+                updated[zone] = members[distances[np.ix_(members, members)].sum(axis=1).argmin()]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+    return medoids, distances[:, medoids].argmin(axis=1)
+
+
+def allocate_vehicles(vehicles, zone_sizes):
+    # Proportional to zone size with largest remainders, at least one vehicle per zone
+    zone_sizes = np.asarray(zone_sizes, dtype=np.float64)
+    assert vehicles >= len(zone_sizes), "Need at least one vehicle per zone"
+    share = 1 + (vehicles - len(zone_sizes)) * zone_sizes / zone_sizes.sum()
+    allocation = np.floor(share).astype(int)
+    remainders = np.argsort(-(share - allocation), kind='stable')
+    allocation[remainders[:vehicles - allocation.sum()]] += 1
+    return allocation.tolist()
+
+
+def _solve_zone(solver, vehicles, shifts, matrix, solver_kwargs, seed):
+    # Zone instances use local indices: 0 is the depot, i is the zone's i-th location
+    random.seed(seed)
+    np.random.seed(seed)
+    if solver == 'gdvps':
+        ga = GDVPS(vehicles=vehicles, locations=matrix.shape[0] - 1, shifts=shifts, heuristic_file=None,
+                   distance_matrix=matrix, **solver_kwargs)
+        best_solution, _, _ = ga.run()
+        return best_solution.to_dict()
+    hvsp = HVSP(vehicles=vehicles, total_locations=matrix.shape[0], shifts=shifts, travel_times=matrix, **solver_kwargs)
+    hvsp.simulate()
+    return hvsp.schedule
+
+
+class DecomposedSolver:
+    # Clusters the locations into zones on travel times, solves every zone as an independent
+    # instance sharing the depot, and stitches the zone schedules back into one schedule
+    def __init__(self, vehicles, locations, zones=4, solver='gdvps', shifts=6, travel_times=None, workers=None,
+                 seed=None, **solver_kwargs):
+        assert solver in SOLVERS, f"Solver must be one of {SOLVERS}"
+        assert 0 < zones <= vehicles, "Number of zones must be between 1 and the number of vehicles"
+
+        self.vehicles = vehicles
+        self.zones = zones
+        self.solver = solver
+        self.shifts = shifts
+        self.workers = workers or min(zones, os.cpu_count() or 1)
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.solver_kwargs = solver_kwargs
+        if travel_times is None:
+            # locations means what it means to the solver: GDVPS excludes the depot, HVSP includes it
+            if solver == 'gdvps':
+                travel_times = GDVPS(vehicles, locations, shifts, heuristic_file=None, population=[]).base_distance_matrix
+            else:
+                travel_times = HVSP(vehicles, locations, shifts).base_travel_times
+        self.travel_times = np.asarray(travel_times)
+        assert self.travel_times.shape[0] - 1 >= zones, "Need at least one location per zone"
+        self.zone_locations = None
+        self.zone_vehicles = None
+
+    def partition(self):
+        clustering_sequence, _ = self.seed_sequence.spawn(2)
+        _, assignment = k_medoids(clustering_distances(self.travel_times), self.zones,
+                                  np.random.default_rng(clustering_sequence))
+        # Global indices per zone with the depot first, so local index i maps to zone_locations[zone][i]
+        self.zone_locations = [np.concatenate([[0], np.flatnonzero(assignment == zone) + 1]) for zone in range(self.zones)]
+        self.zone_vehicles = allocate_vehicles(self.vehicles, [len(locations) - 1 for locations in self.zone_locations])
+        return self.zone_locations, self.zone_vehicles
+
+    def run(self):
+        if self.zone_locations is None:
+            self.partition()
+        _, solver_sequence = self.seed_sequence.spawn(2)
+        seeds = [int(sequence.generate_state(1)[0]) for sequence in solver_sequence.spawn(self.zones)]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(_solve_zone, self.solver, self.zone_vehicles[zone], self.shifts,
+                                   self.travel_times[np.ix_(locations, locations)], self.solver_kwargs, seeds[zone])
+                       for zone, locations in enumerate(self.zone_locations)]
+            zone_schedules = [future.result() for future in futures]
+
+        schedule = self.stitch(zone_schedules)
+        return schedule, self.coverage(schedule)
+
+    def stitch(self, zone_schedules):
+        # Zone vehicles are numbered consecutively; HVSP labels its closing depot past the last index, which maps to 0
+        schedule = {shift: {} for shift in range(self.shifts)}
+        first_vehicle = 0
+        for locations, vehicles, zone_schedule in zip(self.zone_locations, self.zone_vehicles, zone_schedules):
+            to_global = {local: int(location) for local, location in enumerate(locations)}
+            to_global[len(locations)] = 0
+            for shift, shift_routes in zone_schedule.items():
+                for vehicle, (route, timings) in shift_routes.items():
+                    schedule[shift][first_vehicle + vehicle] = ([to_global[loc] for loc in route],
+                                                                [(to_global[loc], time) for loc, time in timings])
+            first_vehicle += vehicles
+        return schedule
+
+    def coverage(self, schedule):
+        visited = {loc for shift_routes in schedule.values() for route, _ in shift_routes.values() for loc in route}
+        visited.discard(0)
+        return len(visited)
+
+
+if __name__ == "__main__":
+    decomposed = DecomposedSolver(vehicles=15, locations=1000, zones=5, solver='gdvps', seed=0)
+    zone_locations, zone_vehicles = decomposed.partition()
+    print(f"Zone sizes: {[len(locations) - 1 for locations in zone_locations]}, vehicles per zone: {zone_vehicles}")
+    schedule, covered = decomposed.run()
+    print(f"Distinct locations visited: {covered}")
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+
+class FitnessCache:
+    # LRU cache of scores keyed by Chromosome.key(); each entry is tagged with the travel-time
+    # matrix version it was computed under and is treated as a miss once that version is stale.
+    def __init__(self, max_size=4096):
+        assert max_size > 0, "Cache size must be positive"
+        self.max_size = max_size
+        self.version = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_version(self, version):
+        self.version = version
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        version, value = entry
+        if version != self.version:
+            del self.entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = (self.version, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'stale': self.stale,
+                'evictions': self.evictions, 'hit_rate': self.hit_rate}
@@ -0,0 +1,164 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from GDVPS import GDVPS
+
+TOPOLOGIES = ('ring', 'fully_connected', 'random')
+
+_shared_matrix = None
+
+
+def _attach_shared_matrix(name, shape, dtype):
+    global _shared_matrix
+    shm = shared_memory.SharedMemory(name=name)
+    matrix = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    matrix.flags.writeable = False
+    _shared_matrix = (shm, matrix)
+
+
+def _evolve_island(ga_kwargs, heuristic_solutions, population, rng_state, immigrants, generations, time_budget):
+    ga = GDVPS(**ga_kwargs, generations=generations, heuristic_file=None, distance_matrix=_shared_matrix[1],
+               population=population if population is not None else [], time_budget=time_budget)
+    if isinstance(rng_state, int):
+        random.seed(rng_state)
+        np.random.seed(rng_state)
+    else:
+        random.setstate(rng_state[0])
+        np.random.set_state(rng_state[1])
+
+    if population is None:
+        ga.heuristic_solutions = heuristic_solutions
+        ga.population = ga.initialize_population()
+    else:
+        # Distance subtotals are tagged with matrix versions of the instance that computed them
+        for individual in population + immigrants:
+            individual.invalidate_distances()
+    if immigrants:
+        # run() leaves the population sorted best-first, so immigrants replace the worst individuals
+        ga.population[-len(immigrants):] = immigrants
+
+    best_solution, best_fitness, best_fitnesses = ga.run()
+    return ga.population, (random.getstate(), np.random.get_state()), best_solution, best_fitness, best_fitnesses
+
+
+class IslandGDVPS:
+    def __init__(self, vehicles, locations, islands=4, migration_interval=10, migration_size=2, topology='ring',
+                 workers=None, seed=None, generations=500, heuristic_file=None, distance_matrix=None, **ga_kwargs):
+        assert islands > 0, "Number of islands must be positive"
+        assert migration_interval > 0, "Migration interval must be positive"
+        assert topology in TOPOLOGIES, f"Topology must be one of {TOPOLOGIES}"
+
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = topology
+        self.workers = workers or min(islands, os.cpu_count() or 1)
+        self.generations = generations
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.ga_kwargs = dict(ga_kwargs, vehicles=vehicles, locations=locations)
+        # Template instance: owns the base matrix, heuristic seeds and result helpers, but no population.
+        # Shortest paths are resolved here once; workers receive the resulting matrix as is.
+        self.template = GDVPS(**self.ga_kwargs, generations=generations, heuristic_file=heuristic_file,
+                              distance_matrix=distance_matrix, population=[])
+        self.ga_kwargs.pop('shortest_paths', None)
+        self.ga_kwargs.pop('cache_dir', None)
+        # Islands would overwrite each other's checkpoints
+        self.ga_kwargs.pop('checkpoint_file', None)
+        self.ga_kwargs.pop('checkpoint_interval', None)
+        # Progress is reported once for the whole archipelago through the template's sink
+        self.ga_kwargs.pop('telemetry', None)
+        # One deadline covers the whole run; every epoch gets what is left of it
+        self.time_budget = self.ga_kwargs.pop('time_budget', None)
+
+    def migration_sources(self, rng):
+        if self.topology == 'ring':
+            return [[(island - 1) % self.islands] for island in range(self.islands)]
+        if self.topology == 'fully_connected':
+            return [[source for source in range(self.islands) if source != island] for island in range(self.islands)]
+        targets = rng.permutation(self.islands)
+        sources = [[] for _ in range(self.islands)]
+        for source, target in enumerate(targets):
+            if source != target:
+                sources[target].append(source)
+        return sources
+
+    def run(self):
+        matrix = np.ascontiguousarray(self.template.base_distance_matrix)
+        shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        try:
+            np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[:] = matrix
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_shared_matrix,
+                                     initargs=(shm.name, matrix.shape, matrix.dtype)) as pool:
+                return self._run_epochs(pool)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _run_epochs(self, pool):
+        child_seeds = self.seed_sequence.spawn(self.islands + 1)
+        migration_rng = np.random.default_rng(child_seeds[-1])
+        populations = [None] * self.islands
+        rng_states = [int(child.generate_state(1)[0]) for child in child_seeds[:-1]]
+        immigrants = [[] for _ in range(self.islands)]
+
+        best_fitnesses = []
+        best_solution = None
+        best_fitness = float('-inf')
+        stagnation_count = 0
+        generation = 0
+        deadline = time.monotonic() + self.time_budget if self.time_budget is not None else None
+        reason = None
+
+        while generation < self.generations:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            # The first epoch always runs: with no time left, islands still return their best initial individual
+            if remaining == 0 and best_solution is not None:
+                reason = 'time_budget'
+                break
+            generations = min(self.migration_interval, self.generations - generation)
+            futures = [pool.submit(_evolve_island, self.ga_kwargs, self.template.heuristic_solutions, populations[island],
+                                   rng_states[island], immigrants[island], generations, remaining)
+                       for island in range(self.islands)]
+            results = [future.result() for future in futures]
+
+            histories = []
+            for island, (population, rng_state, island_solution, island_fitness, island_history) in enumerate(results):
+                populations[island] = population
+                rng_states[island] = rng_state
+                if island_history:
+                    histories.append(island_history)
+                if island_fitness > best_fitness:
+                    best_fitness = island_fitness
+                    best_solution = island_solution
+
+            # Islands may stop early on their share of the budget; shorter histories hold their last value
+            ran = max((len(history) for history in histories), default=0)
+            if ran == 0:
+                reason = 'time_budget'
+                break
+            histories = [history + history[-1:] * (ran - len(history)) for history in histories]
+            for current_best_fitness in np.max(histories, axis=0).tolist():
+                if best_fitnesses and current_best_fitness <= max(best_fitnesses):
+                    stagnation_count += 1
+                else:
+                    stagnation_count = 0
+                best_fitnesses.append(current_best_fitness)
+            generation += ran
+
+            if stagnation_count >= self.template.stagnation_limit:
+                reason = 'stagnation'
+                break
+
+            elites = [population[:self.migration_size] for population in populations]
+            immigrants = [[elite.copy() for source in sources for elite in elites[source]]
+                          for sources in self.migration_sources(migration_rng)]
+
+        if reason is not None and self.template.telemetry.enabled:
+            self.template.telemetry.emit({'event': 'terminated', 'generation': generation, 'best_fitness': best_fitness,
+                                          'reason': reason})
+        return best_solution, best_fitness, best_fitnesses
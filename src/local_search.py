@@ -0,0 +1,143 @@
+import numpy as np
+
+
+class LocalSearch:
+    # Memetic step for GDVPS: 2-opt and or-opt shorten a route, which frees time to insert locations the
+    # individual does not visit yet. Candidate moves come from k-nearest-neighbour lists, so a move is
+    # priced in O(k); only improving candidates are re-timed and checked against the shift length, the
+    # 30-minute revisit rule and the arrival times other vehicles already hold in the shift.
+    def __init__(self, ga, neighbors=10, passes=3):
+        self.ga = ga
+        self.neighbor_count = neighbors
+        self.passes = passes
+        self.build_neighbors()
+
+    def build_neighbors(self):
+        matrix = np.array(self.ga.base_distance_matrix, dtype=np.float64)
+        np.fill_diagonal(matrix, np.inf)
+        matrix[:, 0] = np.inf
+        count = min(self.neighbor_count, matrix.shape[0] - 2)
+        nearest = np.argpartition(matrix, count, axis=1)[:, :count]
+        nearest = np.take_along_axis(nearest, np.take_along_axis(matrix, nearest, axis=1).argsort(axis=1), axis=1)
+        reachable = np.isfinite(np.take_along_axis(matrix, nearest, axis=1))
+        self.neighbors = [row[keep].tolist() for row, keep in zip(nearest, reachable)]
+
+    def improve(self, individual):
+        # Scores are kept current through set_route, so individual.fitness is valid afterwards
+        if not individual.scored:
+            visits, route_distances = self.ga.score_population([individual])
+            individual.attach_scores(visits[0], route_distances[0], self.ga.matrix_version)
+        improved = 0
+        for shift in range(self.ga.shifts):
+            occupied = self.ga.occupancy_index(individual, shift)
+            for vehicle in range(self.ga.vehicles):
+                if individual.lengths[shift, vehicle] > 2 and self.improve_route(individual, shift, vehicle, occupied):
+                    improved += 1
+        return improved
+
+    def improve_route(self, individual, shift, vehicle, occupied):
+        route, times = individual.route(shift, vehicle).tolist(), individual.arrival_times(shift, vehicle).tolist()
+        for loc, arrival_time in zip(route, times):
+            occupied.get(loc, set()).discard(arrival_time)
+        timed = self.timed(shift, route, occupied)
+        changed = False
+        if timed is not None:
+            added = set()
+            for _ in range(self.passes):
+                moved = False
+                for move in (self.two_opt, self.or_opt, self.insert_unvisited):
+                    for _ in range(len(route)):
+                        candidate = move(shift, route, timed, occupied, individual.visits, added)
+                        if candidate is None:
+                            break
+                        route, timed = candidate
+                        moved = True
+                if not moved:
+                    break
+                changed = True
+            if changed:
+                individual.set_route(shift, vehicle, route, timed)
+                times = timed
+        self.ga.occupy(occupied, route, times)
+        return changed
+
+    def timed(self, shift, route, occupied):
+        # Arrival times for the route, or None if it breaks a constraint
+        matrix = self.ga.distance_matrix
+        shift_length = self.ga.shift_lengths[shift]
+        times = [0.0]
+        for start, end in zip(route, route[1:]):
+            times.append(times[-1] + matrix[start, end] + (self.ga.patrol_time if end != 0 else 0))
+        last_visit = {}
+        for loc, arrival_time in zip(route, times):
+            if arrival_time + matrix[loc, 0] > shift_length:
+                return None
+            if loc != 0:
+                if loc in last_visit and arrival_time - last_visit[loc] <= 30:
+                    return None
+                if arrival_time in occupied.get(loc, ()):
+                    return None
+                last_visit[loc] = arrival_time
+        return times
+
+    def two_opt(self, shift, route, times, occupied, visits, added):
+        # Reverses route[i + 1:j + 1] when a neighbour c of a = route[i] sits at j; the last stop stays put
+        matrix = self.ga.distance_matrix
+        positions = {loc: index for index, loc in enumerate(route)}
+        for i in range(len(route) - 3):
+            a, b = route[i], route[i + 1]
+            for c in self.neighbors[a]:
+                j = positions.get(c)
+                if j is None or j <= i + 1 or j >= len(route) - 1:
+                    continue
+                e = route[j + 1]
+                if matrix[a, c] + matrix[b, e] - matrix[a, b] - matrix[c, e] < -1e-9:
+                    candidate = route[:i + 1] + route[i + 1:j + 1][::-1] + route[j + 1:]
+                    candidate_times = self.timed(shift, candidate, occupied)
+                    if candidate_times is not None:
+                        return candidate, candidate_times
+        return None
+
+    def or_opt(self, shift, route, times, occupied, visits, added):
+        # Moves a segment of up to three stops next to a neighbour of its first stop
+        matrix = self.ga.distance_matrix
+        positions = {loc: index for index, loc in enumerate(route)}
+        for length in (1, 2, 3):
+            for i in range(1, len(route) - length):
+                first, last = route[i], route[i + length - 1]
+                before, after = route[i - 1], route[i + length]
+                removal = matrix[before, first] + matrix[last, after] - matrix[before, after]
+                rest = route[:i] + route[i + length:]
+                for c in self.neighbors[first]:
+                    j = positions.get(c)
+                    if j is None or i - 1 <= j <= i + length - 1:
+                        continue
+                    k = j if j < i else j - length
+                    if k + 1 >= len(rest):
+                        continue
+                    following = rest[k + 1]
+                    if matrix[c, first] + matrix[last, following] - matrix[c, following] - removal < -1e-9:
+                        candidate = rest[:k + 1] + route[i:i + length] + rest[k + 1:]
+                        candidate_times = self.timed(shift, candidate, occupied)
+                        if candidate_times is not None:
+                            return candidate, candidate_times
+        return None
+
+    def insert_unvisited(self, shift, route, times, occupied, visits, added):
+        # Inserts a location no vehicle of the individual visits between a = route[i] and b = route[i + 1]
+        if len(route) >= self.ga.route_width:
+            return None
+        matrix = self.ga.distance_matrix
+        slack = self.ga.shift_lengths[shift] - times[-1] - matrix[route[-1], 0]
+        for i in range(len(route) - 1):
+            a, b = route[i], route[i + 1]
+            for c in self.neighbors[a]:
+                if visits[c] or c in added:
+                    continue
+                if matrix[a, c] + self.ga.patrol_time + matrix[c, b] - matrix[a, b] <= slack:
+                    candidate = route[:i + 1] + [c] + route[i + 1:]
+                    candidate_times = self.timed(shift, candidate, occupied)
+                    if candidate_times is not None:
+                        added.add(c)
+                        return candidate, candidate_times
+        return None
@@ -0,0 +1,336 @@
+import math
+import sys
+
+import numpy as np
+
+# Binary instance layout read by src/OPL/InstanceLoader.cpp, all little-endian:
+#   8-byte magic, int32 locations, depot, Tmax, cars, maxCarVisits, maxLocSessions,
+#   float64[locations * locations] travel times (inf where there is no direct path),
+#   float64[locations] taul, float64[locations] taulg,
+#   int32[cars] initial locations, int32[cars] rest times, float64[cars] break starts, float64[cars] break ends
+MAGIC = b'PATROL01'
+BIG_M = 1000
+
+
+class PatrolInstance:
+    def __init__(self, travel_times, depot, tmax, cars, max_car_visits, max_loc_sessions, taul, taulg,
+                 initial_locations, rest_times, break_starts, break_ends):
+        self.travel_times = np.asarray(travel_times, dtype=np.float64)
+        self.depot = depot
+        self.tmax = tmax
+        self.cars = cars
+        self.max_car_visits = max_car_visits
+        self.max_loc_sessions = max_loc_sessions
+        self.taul = np.asarray(taul, dtype=np.float64)
+        self.taulg = np.asarray(taulg, dtype=np.float64)
+        self.initial_locations = np.asarray(initial_locations, dtype=np.int32)
+        self.rest_times = np.asarray(rest_times, dtype=np.int32)
+        self.break_starts = np.asarray(break_starts, dtype=np.float64)
+        self.break_ends = np.asarray(break_ends, dtype=np.float64)
+
+    @classmethod
+    def from_solver(cls, travel_times, vehicles, shift_lengths, patrol_time, rest_period, max_car_visits=None,
+                    max_loc_sessions=None):
+        # The heuristics' rules expressed in the model's terms: the depot is location 0, every other location
+        # is patrolled for patrol_time, consecutive arrivals at a location are more than 30 minutes apart
+        # (taul + taulg = 30), and each car takes its depot break between its first and second shift
+        travel_times = np.asarray(travel_times, dtype=np.float64)
+        locations = travel_times.shape[0]
+        horizon = int(sum(shift_lengths) + rest_period * (len(shift_lengths) - 1))
+        if max_car_visits is None:
+            legs = travel_times[np.isfinite(travel_times) & (travel_times > 0)]
+            shortest_stop = (legs.min() if len(legs) else 0) + patrol_time
+            max_car_visits = int(math.ceil(horizon / shortest_stop)) + 1
+        if max_loc_sessions is None:
+            max_loc_sessions = horizon // 30 + 1
+        taul = np.full(locations, patrol_time, dtype=np.float64)
+        taulg = np.full(locations, max(0, 30 - patrol_time), dtype=np.float64)
+        taul[0] = taulg[0] = 0
+        break_start = shift_lengths[0]
+        return cls(travel_times, 0, horizon + 120, vehicles, max_car_visits, max_loc_sessions, taul, taulg,
+                   np.zeros(vehicles), np.full(vehicles, rest_period), np.full(vehicles, break_start),
+                   np.full(vehicles, break_start + rest_period))
+
+    @classmethod
+    def from_gdvps(cls, ga, **caps):
+        return cls.from_solver(ga.base_distance_matrix, ga.vehicles, ga.shift_lengths, ga.patrol_time, ga.rest_period, **caps)
+
+    @classmethod
+    def from_hvsp(cls, hvsp, **caps):
+        return cls.from_solver(hvsp.base_travel_times, hvsp.vehicles, hvsp.shift_lengths, hvsp.patrol_time, hvsp.rest_period, **caps)
+
+    @property
+    def locations(self):
+        return self.travel_times.shape[0]
+
+    @property
+    def adjacency(self):
+        adjacency = np.isfinite(self.travel_times)
+        np.fill_diagonal(adjacency, False)
+        return adjacency
+
+    def write(self, path):
+        with open(path, 'wb') as file:
+            file.write(MAGIC)
+            file.write(np.array([self.locations, self.depot, self.tmax, self.cars, self.max_car_visits,
+                                 self.max_loc_sessions], dtype='<i4').tobytes())
+            for array, dtype in ((self.travel_times, '<f8'), (self.taul, '<f8'), (self.taulg, '<f8'),
+                                 (self.initial_locations, '<i4'), (self.rest_times, '<i4'),
+                                 (self.break_starts, '<f8'), (self.break_ends, '<f8')):
+                file.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a patrol instance file")
+            locations, depot, tmax, cars, max_car_visits, max_loc_sessions = np.fromfile(file, dtype='<i4', count=6).tolist()
+            travel_times = np.fromfile(file, dtype='<f8', count=locations * locations).reshape(locations, locations)
+            taul = np.fromfile(file, dtype='<f8', count=locations)
+            taulg = np.fromfile(file, dtype='<f8', count=locations)
+            initial_locations = np.fromfile(file, dtype='<i4', count=cars)
+            rest_times = np.fromfile(file, dtype='<i4', count=cars)
+            break_starts = np.fromfile(file, dtype='<f8', count=cars)
+            break_ends = np.fromfile(file, dtype='<f8', count=cars)
+        return cls(travel_times, depot, tmax, cars, max_car_visits, max_loc_sessions, taul, taulg,
+                   initial_locations, rest_times, break_starts, break_ends)
+
+
+class LPWriter:
+    # Streams a CPLEX LP file: terms are consumed from iterables and written as they come,
+    # wrapped so no line grows past what LP readers accept
+    TERMS_PER_LINE = 8
+
+    def __init__(self, file):
+        self.file = file
+        self.rows = 0
+
+    def section(self, header):
+        self.file.write(f"{header}\n")
+
+    def expression(self, terms):
+        line = []
+        first = True
+        for coefficient, variable in terms:
+            if coefficient == 0:
+                continue
+            magnitude = abs(coefficient)
+            term = variable if magnitude == 1 else f"{magnitude:.12g} {variable}"
+            if coefficient < 0:
+                term = f"- {term}"
+            elif not first:
+                term = f"+ {term}"
+            line.append(term)
+            first = False
+            if len(line) == self.TERMS_PER_LINE:
+                self.file.write(" " + " ".join(line) + "\n")
+                line = []
+        if line:
+            self.file.write(" " + " ".join(line))
+
+    def objective(self, name, terms):
+        self.file.write(f" {name}:")
+        self.expression(terms)
+        self.file.write("\n")
+
+    def constraint(self, name, terms, sense, rhs):
+        self.file.write(f" {name}:")
+        self.expression(terms)
+        self.file.write(f" {sense} {rhs:.12g}\n")
+        self.rows += 1
+
+    def bound(self, variable, lower, upper):
+        self.file.write(f" {lower:.12g} <= {variable} <= {upper:.12g}\n")
+
+    def names(self, variables):
+        line = []
+        for variable in variables:
+            line.append(variable)
+            if len(line) == self.TERMS_PER_LINE:
+                self.file.write(" " + " ".join(line) + "\n")
+                line = []
+        if line:
+            self.file.write(" " + " ".join(line) + "\n")
+
+
+def x(c, l, v):
+    return f"x_c{c}_l{l}_v{v}"
+
+
+def y(c, l, v, s):
+    return f"y_c{c}_l{l}_v{v}_s{s}"
+
+
+def tau_ca(c, v):
+    return f"tauCA_c{c}_v{v}"
+
+
+def tau_cp(c, v):
+    return f"tauCP_c{c}_v{v}"
+
+
+def tau_la(l, s):
+    return f"tauLA_l{l}_s{s}"
+
+
+def write_lp(instance, path):
+    # Mirrors IlpPatrolScheduler::run constraint by constraint. Products are linearized the way the C++ model
+    # already does for binary x continuous terms (L <= M y, L <= tau, L >= M (y - 1) + tau); the logical AND in
+    # C6 becomes z <= a, z <= b, z >= a + b - 1, and the (s < Nl[l]) indicators of C9/C10 become binaries
+    # u_l_s with Nl[l] = sum_s u_l_s and u_l_s >= u_l_s+1.
+    cars, locations = instance.cars, instance.locations
+    visits, sessions = instance.max_car_visits, instance.max_loc_sessions
+    depot = instance.depot
+    travel_times = np.where(np.isfinite(instance.travel_times), instance.travel_times, 0).tolist()
+    adjacency = instance.adjacency
+    predecessors = [np.flatnonzero(adjacency[:, l]).tolist() for l in range(locations)]
+    # Moves C4 rules out contribute nothing to C6, so only adjacent pairs with a travel time get an AND variable
+    moves = [(int(l1), int(l2)) for l1, l2 in zip(*np.nonzero(adjacency)) if travel_times[l1][l2] != 0]
+    taul, taulg = instance.taul.tolist(), instance.taulg.tolist()
+    # C12, C13 and C15 sum the depot sessions over range(numberOfCars_) in the C++ model; kept, within range
+    depot_sessions = range(min(cars, sessions))
+    # The C++ model's fixed M of 1000 only holds while every time variable stays below it
+    big_m = max(BIG_M, instance.tmax)
+
+    with open(path, 'w') as file:
+        lp = LPWriter(file)
+        lp.section("\\ Patrol scheduling MILP exported by milp_export.py")
+        lp.section("Maximize")
+        lp.objective("obj", ((1, f"Nl_l{l}") for l in range(locations) if l != depot))
+        lp.section("Subject To")
+
+        for c in range(cars):
+            lp.constraint(f"c1_{c}", [(1, x(c, int(instance.initial_locations[c]), 0))], '=', 1)
+
+        for c in range(cars):
+            for l in range(locations):
+                for v in range(visits):
+                    for s in range(sessions):
+                        lp.constraint(f"c2_c{c}_l{l}_v{v}_s{s}", [(1, y(c, l, v, s)), (-1, x(c, l, v))], '<=', 0)
+
+        for c in range(cars):
+            for v in range(visits):
+                lp.constraint(f"c3_c{c}_v{v}", ((1, x(c, l, v)) for l in range(locations)), '=', 1)
+
+        for c in range(cars):
+            for v in range(1, visits):
+                for l1 in range(locations):
+                    terms = [(1, x(c, l1, v))] + [(-1, x(c, l2, v - 1)) for l2 in predecessors[l1]]
+                    lp.constraint(f"c4_c{c}_v{v}_l{l1}", terms, '<=', 0)
+
+        for l in range(locations):
+            for s in range(sessions):
+                lp.constraint(f"c5_l{l}_s{s}", ((1, y(c, l, v, s)) for c in range(cars) for v in range(visits)), '<=', 1)
+
+        for c in range(cars):
+            for v in range(1, visits):
+                for l1, l2 in moves:
+                    z = f"z_c{c}_v{v}_l{l1}_l{l2}"
+                    lp.constraint(f"c6a_{z}", [(1, z), (-1, x(c, l1, v - 1))], '<=', 0)
+                    lp.constraint(f"c6b_{z}", [(1, z), (-1, x(c, l2, v))], '<=', 0)
+                    lp.constraint(f"c6c_{z}", [(1, z), (-1, x(c, l1, v - 1)), (-1, x(c, l2, v))], '>=', -1)
+                terms = [(1, tau_ca(c, v - 1)), (1, tau_cp(c, v - 1)), (-1, tau_ca(c, v))]
+                terms += [(travel_times[l1][l2], f"z_c{c}_v{v}_l{l1}_l{l2}") for l1, l2 in moves]
+                lp.constraint(f"c6_c{c}_v{v}", terms, '=', 0)
+
+        def linked(prefix, binary, tau):
+            # L = binary * tau for a binary and a tau bounded by big_m
+            lp.constraint(f"{prefix}L1", [(1, f"L_{prefix}"), (-big_m, binary)], '<=', 0)
+            lp.constraint(f"{prefix}L2", [(1, f"L_{prefix}"), (-1, tau)], '<=', 0)
+            lp.constraint(f"{prefix}L3", [(1, f"L_{prefix}"), (-big_m, binary), (-1, tau)], '>=', -big_m)
+            return f"L_{prefix}"
+
+        for c in range(cars):
+            for l in range(locations):
+                for v in range(visits):
+                    for s in range(sessions):
+                        index = f"c{c}_l{l}_v{v}_s{s}"
+                        product = linked(f"c7a_{index}", y(c, l, v, s), tau_ca(c, v))
+                        lp.constraint(f"c7a_{index}", [(1, product), (-1, tau_la(l, s))], '<=', 0)
+                        if s > 0:
+                            product = linked(f"c7b_{index}", y(c, l, v, s), tau_la(l, s - 1))
+                            lp.constraint(f"c7b_{index}", [(1, tau_ca(c, v)), (-1, product),
+                                                           (-(taul[l] + taulg[l]), y(c, l, v, s))], '>=', 0)
+
+        for c in range(cars):
+            for l in range(locations):
+                for v in range(visits):
+                    for s in range(sessions):
+                        lp.constraint(f"c8_c{c}_l{l}_v{v}_s{s}", [(taul[l], y(c, l, v, s)), (-1, tau_cp(c, v))], '<=', 0)
+
+        for l in range(locations):
+            lp.constraint(f"nl_l{l}", [(1, f"Nl_l{l}")] + [(-1, f"u_l{l}_s{s}") for s in range(sessions)], '=', 0)
+            for s in range(1, sessions):
+                lp.constraint(f"u_l{l}_s{s}", [(1, f"u_l{l}_s{s - 1}"), (-1, f"u_l{l}_s{s}")], '>=', 0)
+            for s in range(sessions):
+                terms = [(1, y(c, l, v, s)) for c in range(cars) for v in range(visits)] + [(-1, f"u_l{l}_s{s}")]
+                lp.constraint(f"c9_l{l}_s{s}", terms, '=', 0)
+
+        for l in range(locations):
+            for s in range(1, sessions):
+                lp.constraint(f"c10_l{l}_s{s}", [(1, tau_la(l, s)), (-(taul[l] + taulg[l]), f"u_l{l}_s{s}"),
+                                                 (-1, tau_la(l, s - 1))], '>=', 0)
+
+        for c in range(cars):
+            for l in range(locations):
+                for v in range(visits):
+                    for s in range(sessions):
+                        index = f"c{c}_l{l}_v{v}_s{s}"
+                        product = linked(f"c11b_{index}", y(c, l, v, s), tau_la(l, s))
+                        lp.constraint(f"c11_{index}", [(1, tau_ca(c, v)), (1, tau_cp(c, v)), (-taul[l], y(c, l, v, s)),
+                                                       (-1, product)], '>=', 0)
+
+        for c in range(cars):
+            lp.constraint(f"c12_c{c}", ((1, y(c, depot, v, s)) for v in range(visits) for s in depot_sessions), '=', 1)
+
+        for c in range(cars):
+            for v in range(visits):
+                lp.constraint(f"c13_c{c}_v{v}", [(1, tau_cp(c, v))] + [(-int(instance.rest_times[c]), y(c, depot, v, s))
+                                                                       for s in depot_sessions], '>=', 0)
+
+        for c in range(cars):
+            for v in range(visits):
+                terms = []
+                for s in range(sessions):
+                    index = f"c{c}_v{v}_s{s}"
+                    terms.append((1, linked(f"c14a_{index}", y(c, depot, v, s), tau_ca(c, v))))
+                    terms.append((1, linked(f"c14b_{index}", y(c, depot, v, s), tau_cp(c, v))))
+                lp.constraint(f"c14_c{c}_v{v}", terms, '<=', float(instance.break_ends[c]))
+
+        for c in range(cars):
+            for v in range(visits):
+                lp.constraint(f"c15_c{c}_v{v}", [(1, tau_ca(c, v))] + [(-float(instance.break_starts[c]), y(c, depot, v, s))
+                                                                       for s in depot_sessions], '>=', 0)
+
+        lp.section("Bounds")
+        for c in range(cars):
+            for v in range(visits):
+                lp.bound(tau_ca(c, v), 0, instance.tmax - 120)
+                lp.bound(tau_cp(c, v), 0, 120)
+            lp.bound(f"Nc_c{c}", 0, visits)
+        for l in range(locations):
+            for s in range(sessions):
+                lp.bound(tau_la(l, s), 0, instance.tmax - 120)
+            lp.bound(f"Nl_l{l}", 0, sessions)
+
+        lp.section("Generals")
+        lp.names(f"Nc_c{c}" for c in range(cars))
+        lp.names(f"Nl_l{l}" for l in range(locations))
+        lp.section("Binaries")
+        lp.names(x(c, l, v) for c in range(cars) for l in range(locations) for v in range(visits))
+        lp.names(y(c, l, v, s) for c in range(cars) for l in range(locations) for v in range(visits) for s in range(sessions))
+        lp.names(f"u_l{l}_s{s}" for l in range(locations) for s in range(sessions))
+        lp.section("End")
+    return lp.rows
+
+
+if __name__ == "__main__":
+    # python milp_export.py <vehicles> <locations> <output prefix>: a GDVPS-distributed instance as .bin and .lp
+    from GDVPS import GDVPS
+
+    vehicles, locations, prefix = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+    ga = GDVPS(vehicles=vehicles, locations=locations, heuristic_file=None, population=[])
+    instance = PatrolInstance.from_gdvps(ga)
+    instance.write(f"{prefix}.bin")
+    rows = write_lp(instance, f"{prefix}.lp")
+    print(f"Wrote {prefix}.bin and {prefix}.lp ({rows} constraints)")
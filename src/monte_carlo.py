@@ -0,0 +1,150 @@
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from AHBPS import HVSP
+
+
+class RunningStats:
+    # Welford accumulator, so aggregates can be reported without keeping every sample
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+def _seed_globals(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _simulate(vehicles, locations, hvsp_kwargs, matrix, iteration_seed):
+    # matrix is (name, shape, dtype) of the case's travel times in shared memory, built once by the runner
+    name, shape, dtype = matrix
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        travel_times = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        travel_times.flags.writeable = False
+        hvsp = HVSP(vehicles=vehicles, total_locations=locations, travel_times=travel_times, **hvsp_kwargs)
+        _seed_globals(iteration_seed)
+        start_time = time.perf_counter()
+        unique, total = hvsp.simulate()
+        elapsed = time.perf_counter() - start_time
+        # The buffer cannot be closed while arrays still view it
+        del hvsp, travel_times
+    finally:
+        shm.close()
+    return unique, total, elapsed
+
+
+class MonteCarloRunner:
+    def __init__(self, test_cases, iterations=1, seed=None, workers=None, results_file=None, **hvsp_kwargs):
+        assert iterations > 0, "Number of iterations must be positive"
+        self.test_cases = list(test_cases)
+        self.iterations = iterations
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.workers = workers or os.cpu_count() or 1
+        self.results_file = results_file
+        self.hvsp_kwargs = hvsp_kwargs
+        self.worker_kwargs = {name: value for name, value in hvsp_kwargs.items() if name not in ('shortest_paths', 'cache_dir')}
+
+    def task_seeds(self):
+        # One child sequence per test case: the first draw seeds the instance, the rest seed the iterations
+        for case_sequence in self.seed_sequence.spawn(len(self.test_cases)):
+            yield [int(state) for state in case_sequence.generate_state(self.iterations + 1)]
+
+    def share_instance(self, vehicles, locations, instance_seed):
+        # Same instance every iteration of the case used to rebuild from instance_seed, built once here;
+        # shortest paths are resolved at this point, so workers take the matrix as is
+        _seed_globals(instance_seed)
+        hvsp = HVSP(vehicles=vehicles, total_locations=locations, **self.hvsp_kwargs)
+        matrix = np.ascontiguousarray(hvsp.base_travel_times, dtype=np.float64)
+        shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[:] = matrix
+        return shm, (shm.name, matrix.shape, matrix.dtype)
+
+    def run(self):
+        # Only a few cases hold a shared matrix at a time: enough to keep every worker busy while
+        # the next case's instance is built, without keeping every matrix of the sweep alive
+        live_limit = max(2, -(-self.workers // self.iterations) + 1)
+        pending = deque(enumerate(zip(self.test_cases, self.task_seeds())))
+        live = {}
+        futures = {}
+        summaries = []
+        # Samples are kept by iteration index and reduced in that order, so the floating-point
+        # aggregates do not depend on completion order or worker count
+        samples = [[None] * self.iterations for _ in self.test_cases]
+        completed = [0] * len(self.test_cases)
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                while pending or futures:
+                    while pending and len(live) < live_limit:
+                        case, ((vehicles, locations), seeds) = pending.popleft()
+                        live[case], matrix = self.share_instance(vehicles, locations, seeds[0])
+                        for iteration, iteration_seed in enumerate(seeds[1:]):
+                            future = pool.submit(_simulate, vehicles, locations, self.worker_kwargs, matrix, iteration_seed)
+                            futures[future] = (case, iteration)
+
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        case, iteration = futures.pop(future)
+                        samples[case][iteration] = future.result()
+                        completed[case] += 1
+                        if completed[case] == self.iterations:
+                            summaries.append(self.report(case, self.reduce(samples[case])))
+                            samples[case] = None
+                            shm = live.pop(case)
+                            shm.close()
+                            shm.unlink()
+        finally:
+            for shm in live.values():
+                shm.close()
+                shm.unlink()
+        return summaries
+
+    def reduce(self, samples):
+        stats = {'unique': RunningStats(), 'total': RunningStats(), 'time': RunningStats()}
+        for unique, total, elapsed in samples:
+            stats['unique'].add(unique)
+            stats['total'].add(total)
+            stats['time'].add(elapsed)
+        return stats
+
+    def report(self, case, stats):
+        vehicles, locations = self.test_cases[case]
+        summary = {'vehicles': vehicles, 'locations': locations, 'iterations': self.iterations,
+                   'average_unique': stats['unique'].mean, 'variance_unique': stats['unique'].variance,
+                   'average_total': stats['total'].mean, 'variance_total': stats['total'].variance,
+                   'average_time': stats['time'].mean, 'execution_time': stats['time'].mean * self.iterations}
+        if self.results_file is not None:
+            # Written as soon as the case finishes, as the same record HVSP.main produces plus the root seed
+            HVSP.write_results_to_file(self.results_file, vehicles, self.hvsp_kwargs.get('shifts', 6), locations,
+                                       self.hvsp_kwargs.get('rest_period', 10), summary['average_unique'],
+                                       summary['average_total'], summary['execution_time'],
+                                       variances=(summary['variance_unique'], summary['variance_total']),
+                                       seed=self.seed_sequence.entropy)
+        return summary
+
+
+if __name__ == "__main__":
+    test_cases = [
+        # (vehicles, locations) pairs to sweep
+    ]
+    runner = MonteCarloRunner(test_cases, iterations=10, seed=0, results_file='AHBPS_Run_Time_Large_Instance_Nodes_Changes.jsonl')
+    for summary in runner.run():
+        print(summary)
@@ -1,31 +1,22 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
-gdvps_file = './large_instances/GDVPS_large.txt'
-ahbps_file = './large_instances/AHBPS_large.txt'
-
-gdvps_data = []
-with open(gdvps_file, 'r') as file:
-    for line in file:
-        if "Best fitness" in line:
-            parts = line.strip().split(' => ')
-            conditions = parts[0]
-            best_fitness = float(parts[1].split(',')[0].split(': ')[1])
-            gdvps_data.append([conditions, best_fitness])
-
-ahbps_data = []
-with open(ahbps_file, 'r') as file:
-    for line in file:
-        if "Average Unique Locations Visited" in line:
-            parts = line.strip().split(' => ')
-            conditions = parts[0]
-            unique_locations = float(parts[1].split(',')[0].split(': ')[1])
-            ahbps_data.append([conditions, unique_locations])
-
-gdvps_df = pd.DataFrame(gdvps_data, columns=['Conditions', 'Best Fitness'])
-ahbps_df = pd.DataFrame(ahbps_data, columns=['Conditions', 'Average Unique Locations Visited'])
-
-merged_df = pd.merge(gdvps_df, ahbps_df, on='Conditions')
+from results_store import ResultsStore
+
+gdvps_file = './large_instances/GDVPS_large.jsonl'
+ahbps_file = './large_instances/AHBPS_large.jsonl'
+
+# GDVPS records are streamed; the matching AHBPS record is found through the store's (vehicles, locations) index
+ahbps_store = ResultsStore(ahbps_file)
+rows = []
+for record in ResultsStore(gdvps_file).records(solver='gdvps'):
+    heuristic = ahbps_store.latest(record['vehicles'], record['locations'], solver='ahbps')
+    if heuristic is None:
+        continue
+    conditions = f"{record['vehicles']} vehicles, {record['shifts']} shifts, {record['locations']} locations"
+    rows.append([conditions, record['best_fitness'], heuristic['average_unique']])
+
+merged_df = pd.DataFrame(rows, columns=['Conditions', 'Best Fitness', 'Average Unique Locations Visited'])
 
 # Plotting the data
 plt.figure(figsize=(12, 8))
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+from datetime import datetime
+
+# Typed record schema; fields a solver does not produce are stored as null
+FIELDS = {
+    'solver': str,
+    'timestamp': str,
+    'vehicles': int,
+    'shifts': int,
+    'locations': int,
+    'rest_time': int,
+    'best_fitness': float,
+    'average_fitness': float,
+    'average_unique': float,
+    'average_total': float,
+    'variance_unique': float,
+    'variance_total': float,
+    'execution_time': float,
+    'seed': int,
+}
+
+
+class ResultsStore:
+    # Append-only JSONL file. The index maps (vehicles, locations) to the byte offsets of matching records,
+    # so lookups seek straight to them and nothing but offsets is ever held in memory.
+    def __init__(self, path):
+        self.path = path
+        self.index = None
+
+    def append(self, solver, **fields):
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown result fields: {sorted(unknown)}")
+        record = {name: None for name in FIELDS}
+        record.update(solver=solver, timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        for name, value in fields.items():
+            record[name] = FIELDS[name](value) if value is not None else None
+
+        line = (json.dumps(record) + "\n").encode()
+        with open(self.path, 'ab') as file:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(line)
+        if self.index is not None:
+            self.index.setdefault((record['vehicles'], record['locations']), []).append(offset)
+        return record
+
+    def __iter__(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def records(self, solver=None):
+        for record in self:
+            if solver is None or record['solver'] == solver:
+                yield record
+
+    def build_index(self):
+        self.index = {}
+        if not os.path.exists(self.path):
+            return self.index
+        with open(self.path, 'rb') as file:
+            offset = 0
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    self.index.setdefault((record['vehicles'], record['locations']), []).append(offset)
+                offset += len(line)
+        return self.index
+
+    def read_at(self, offsets):
+        if not offsets:
+            return
+        with open(self.path, 'rb') as file:
+            for offset in offsets:
+                file.seek(offset)
+                yield json.loads(file.readline())
+
+    def lookup(self, vehicles, locations, solver=None):
+        if self.index is None:
+            self.build_index()
+        offsets = self.index.get((vehicles, locations), [])
+        return [record for record in self.read_at(offsets) if solver is None or record['solver'] == solver]
+
+    def latest(self, vehicles, locations, solver=None):
+        if self.index is None:
+            self.build_index()
+        offsets = self.index.get((vehicles, locations), [])
+        for record in self.read_at(offsets[::-1]):
+            if solver is None or record['solver'] == solver:
+                return record
+        return None
+
+
+def import_text_log(text_path, store, solver):
+    # Converts the free-form logs the solvers used to write; records are split on the ----- separator
+    with open(text_path) as file:
+        blocks = file.read().split("-----")
+    imported = 0
+    for block in blocks:
+        header = re.search(r'(\d+) vehicles, (\d+) shifts, (\d+) locations(?:, (\d+) rest time)?', block)
+        if not header:
+            continue
+        fields = {'vehicles': header.group(1), 'shifts': header.group(2), 'locations': header.group(3),
+                  'rest_time': header.group(4)}
+        patterns = {'timestamp': r'Timestamp: ([\d\- :]+\d)',
+                    'best_fitness': r'Best fitness \(distinct locations visited\): ([\d.]+)',
+                    'average_fitness': r'Average fitness: ([\d.]+)',
+                    'average_unique': r'Average Unique Locations Visited: ([\d.]+)',
+                    'average_total': r'Average Total Visits: ([\d.]+?)\.?\s',
+                    'variance_unique': r'Variance Unique Locations Visited: ([\d.]+)',
+                    'variance_total': r'Variance Total Visits: ([\d.]+)',
+                    'execution_time': r'Execution Time: ([\d.]+) seconds'}
+        for name, pattern in patterns.items():
+            match = re.search(pattern, block)
+            fields[name] = match.group(1) if match else None
+        store.append(solver, **{name: value for name, value in fields.items() if value is not None})
+        imported += 1
+    return imported
+
+
+if __name__ == "__main__":
+    import sys
+    # python results_store.py <legacy text log> <store.jsonl> <gdvps|ahbps>
+    text_path, store_path, solver = sys.argv[1:4]
+    print(f"Imported {import_text_log(text_path, ResultsStore(store_path), solver)} records into {store_path}")
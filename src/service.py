@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from AHBPS import HVSP
+from GDVPS import GDVPS
+from telemetry import CallbackSink
+from travel_times import matrix_hash
+
+# Constructor options a request may pass through to each solver
+SOLVER_OPTIONS = {
+    'gdvps': ('population_size', 'generations', 'rest_period', 'patrol_time', 'time_budget', 'shortest_paths'),
+    'ahbps': ('patrol_time', 'rest_period', 'shift_lengths', 'shortest_paths'),
+}
+
+_progress = None
+
+
+def _attach_progress(queue):
+    global _progress
+    _progress = queue
+
+
+def _solve(key, request):
+    # Runs in a pool worker; progress events go through the shared queue, ending with a (key, None) marker
+    try:
+        if request.get('seed') is not None:
+            random.seed(request['seed'])
+            np.random.seed(request['seed'])
+        matrix = np.array(request['travel_matrix'], dtype=np.float64) if request.get('travel_matrix') is not None else None
+        options = request['options']
+        if request['solver'] == 'gdvps':
+            ga = GDVPS(vehicles=request['vehicles'], locations=request['locations'], shifts=request['shifts'],
+                       heuristic_file=None, distance_matrix=matrix,
+                       telemetry=CallbackSink(lambda event: _progress.put((key, event))), **options)
+            best_solution, best_fitness, best_fitnesses = ga.run()
+            return {'fitness': best_fitness, 'best_fitnesses': best_fitnesses, 'schedule': best_solution.to_dict()}
+        hvsp = HVSP(vehicles=request['vehicles'], total_locations=request['locations'], shifts=request['shifts'],
+                    travel_times=matrix, **options)
+        unique, total = hvsp.simulate()
+        return {'fitness': unique, 'total_visits': total, 'schedule': hvsp.schedule}
+    finally:
+        _progress.put((key, None))
+
+
+def validate_request(request):
+    if request.get('solver') not in SOLVER_OPTIONS:
+        raise ValueError(f"solver must be one of {sorted(SOLVER_OPTIONS)}")
+    for field in ('vehicles', 'locations'):
+        if not isinstance(request.get(field), int) or request[field] <= 0:
+            raise ValueError(f"{field} must be a positive integer")
+    if not isinstance(request.setdefault('shifts', 6), int) or request['shifts'] <= 0:
+        raise ValueError("shifts must be a positive integer")
+    unknown = set(request.setdefault('options', {})) - set(SOLVER_OPTIONS[request['solver']])
+    if unknown:
+        raise ValueError(f"Unknown {request['solver']} options: {sorted(unknown)}")
+    if request.get('travel_matrix') is not None:
+        size = request['locations'] + 1 if request['solver'] == 'gdvps' else request['locations']
+        if np.shape(request['travel_matrix']) != (size, size):
+            raise ValueError(f"travel_matrix must be {size}x{size} for {request['locations']} {request['solver']} locations")
+
+
+def request_key(request):
+    # Identical instance descriptions map to the same key; the matrix enters through its hash
+    description = {field: request.get(field) for field in ('solver', 'vehicles', 'locations', 'shifts', 'seed', 'options')}
+    if request.get('travel_matrix') is not None:
+        description['travel_matrix'] = matrix_hash(np.array(request['travel_matrix'], dtype=np.float64))
+    return hashlib.blake2b(json.dumps(description, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+class SchedulingService:
+    # Solves run in a process pool; concurrent identical requests share one solve and
+    # finished results are kept in an LRU cache keyed by request_key
+    def __init__(self, workers=None, cache_size=128):
+        assert cache_size > 0, "Cache size must be positive"
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.jobs = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.solved = 0
+
+    async def start(self):
+        self.manager = multiprocessing.Manager()
+        self.queue = self.manager.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_progress, initargs=(self.queue,))
+        self.dispatcher = asyncio.create_task(self.dispatch_progress())
+
+    async def close(self):
+        self.queue.put(None)
+        await self.dispatcher
+        self.pool.shutdown()
+        self.manager.shutdown()
+
+    async def dispatch_progress(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, self.queue.get)
+            if message is None:
+                return
+            key, event = message
+            job = self.jobs.get(key)
+            if job is None:
+                continue
+            if event is None:
+                job['drained'].set()
+                continue
+            for subscriber in job['subscribers']:
+                subscriber(event)
+
+    async def solve(self, request, progress=None):
+        validate_request(request)
+        # Without a seed or a travel matrix every request describes a fresh random instance,
+        # so it is solved on its own and its result is neither shared nor cached
+        shared = request.get('seed') is not None or request.get('travel_matrix') is not None
+        key = request_key(request) if shared else uuid.uuid4().hex
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        job = self.jobs.get(key)
+        if job is None:
+            loop = asyncio.get_running_loop()
+            job = {'subscribers': [], 'drained': asyncio.Event(), 'shared': shared,
+                   'future': loop.run_in_executor(self.pool, _solve, key, request)}
+            job['task'] = asyncio.create_task(self.complete(key, job))
+            self.jobs[key] = job
+        else:
+            self.coalesced += 1
+        if progress is not None:
+            job['subscribers'].append(progress)
+        # shield: a client going away must not cancel the solve other clients are waiting on
+        return await asyncio.shield(job['task'])
+
+    async def complete(self, key, job):
+        try:
+            result = await job['future']
+            # The worker's end marker arrives after its last progress event, so no event trails the result
+            await job['drained'].wait()
+        finally:
+            del self.jobs[key]
+        self.solved += 1
+        if job['shared']:
+            self.results[key] = result
+            while len(self.results) > self.cache_size:
+                self.results.popitem(last=False)
+        return result
+
+    def stats(self):
+        return {'cached': len(self.results), 'running': len(self.jobs), 'hits': self.hits,
+                'coalesced': self.coalesced, 'solved': self.solved}
+
+    async def handle_connection(self, reader, writer):
+        # JSON lines in both directions. Requests on one connection run concurrently and every
+        # reply carries the request's id: progress events first, then one result or error line.
+        def send(message):
+            writer.write((json.dumps(message) + "\n").encode())
+
+        async def serve(request):
+            request_id = request.get('id')
+            try:
+                if request.get('command') == 'stats':
+                    send({'id': request_id, 'event': 'stats', **self.stats()})
+                else:
+                    progress = (lambda event: send({'id': request_id, **event})) if request.get('progress', True) else None
+                    result = await self.solve(request, progress)
+                    send({'id': request_id, 'event': 'result', **result})
+            except Exception as error:
+                send({'id': request_id, 'event': 'error', 'message': str(error)})
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as error:
+                    send({'event': 'error', 'message': f"Invalid JSON: {error}"})
+                    continue
+                task = asyncio.create_task(serve(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+async def serve_forever(service, socket_path=None, host='127.0.0.1', port=8765):
+    await service.start()
+    try:
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(service.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Patrol scheduling service speaking JSON lines")
+    parser.add_argument('--socket', help="Unix socket path; TCP on --host/--port otherwise")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--cache-size', type=int, default=128)
+    args = parser.parse_args(argv)
+
+    service = SchedulingService(workers=args.workers, cache_size=args.cache_size)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve_forever(service, args.socket, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+
+
+def no_clock():
+    return 0.0
+
+
+class NullSink:
+    # Disabled sinks make GDVPS.run skip timing and event construction altogether
+    enabled = False
+
+    def emit(self, event):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemorySink:
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    enabled = True
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def emit(self, event):
+        self.file.write(json.dumps(event) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class CallbackSink:
+    enabled = True
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, event):
+        self.callback(event)
+
+    def close(self):
+        pass
+
+
+class ConsoleSink:
+    # Prints the same progress lines GDVPS.run used to print unconditionally
+    enabled = True
+
+    def emit(self, event):
+        if event['event'] == 'generation':
+            if event['fluctuated']:
+                print("Fluctuating travel times for this run.")
+            else:
+                print("Keeping travel times constant for this run.")
+            print(f"Generation {event['generation']}, Best Fitness: {event['best_fitness']}, Stagnation Count: {event['stagnation_count']}")
+        elif event['event'] == 'terminated':
+            if event.get('reason') == 'time_budget':
+                print(f"Stopping at generation {event['generation']}: time budget exhausted.")
+            else:
+                print(f"Terminating early at generation {event['generation']} due to lack of improvement.")
+
+    def close(self):
+        pass
@@ -0,0 +1,134 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+def random_travel_times(size, mean, scale, low=None, high=None, integer=False, unreachable=0.0):
+    # Symmetric matrix drawn on the upper triangle and mirrored; unreachable pairs are np.inf
+    upper = np.random.normal(loc=mean, scale=scale, size=(size, size))
+    if low is not None or high is not None:
+        upper = np.clip(upper, low, high)
+    if integer:
+        upper = np.floor(upper)
+    if unreachable:
+        upper[np.random.random((size, size)) < unreachable] = np.inf
+    matrix = np.triu(upper, 1)
+    return matrix + matrix.T
+
+
+def all_pairs_shortest_paths(matrix):
+    # Floyd-Warshall with each pivot relaxed as one broadcast over the whole matrix.
+    # predecessors[i, j] is the stop before j on a shortest i -> j path, -1 if j is unreachable.
+    size = matrix.shape[0]
+    distances = np.array(matrix, dtype=np.float64)
+    np.fill_diagonal(distances, 0)
+    predecessors = np.where(np.isfinite(distances), np.arange(size, dtype=np.int32)[:, None], -1).astype(np.int32)
+    via = np.empty_like(distances)
+    improved = np.empty(distances.shape, dtype=bool)
+    for k in range(size):
+        np.add(distances[:, k, None], distances[None, k, :], out=via)
+        np.less(via, distances, out=improved)
+        np.copyto(distances, via, where=improved)
+        np.copyto(predecessors, predecessors[k], where=improved)
+    return distances, predecessors
+
+
+def matrix_hash(matrix):
+    digest = hashlib.blake2b(np.ascontiguousarray(matrix, dtype=np.float64), digest_size=16)
+    digest.update(str(matrix.shape).encode())
+    return digest.hexdigest()
+
+
+def cached_shortest_paths(matrix, cache_dir):
+    # Results are stored as .npy files named by the matrix hash and memory-mapped on later runs
+    key = matrix_hash(matrix)
+    paths = {name: os.path.join(cache_dir, f"{key}.{name}.npy") for name in ('distances', 'predecessors')}
+    if not all(os.path.exists(path) for path in paths.values()):
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, array in zip(('distances', 'predecessors'), all_pairs_shortest_paths(matrix)):
+            partial = paths[name] + f".{os.getpid()}.tmp"
+            with open(partial, 'wb') as file:
+                np.save(file, array)
+            os.replace(partial, paths[name])
+    return np.load(paths['distances'], mmap_mode='r'), np.load(paths['predecessors'], mmap_mode='r')
+
+
+def reconstruct_path(predecessors, start, end):
+    if predecessors[start, end] < 0:
+        return []
+    path = [end]
+    while end != start:
+        end = int(predecessors[start, end])
+        path.append(end)
+    return path[::-1]
+
+
+class TravelTimeModel:
+    # base is never written to; current is a persistent buffer that holds either base or base plus a
+    # symmetric +/-fluctuation on the reachable pairs, so switching between them never allocates a matrix
+    def __init__(self, base, fluctuation=2, predecessors=None):
+        self.base = base
+        self.predecessors = predecessors
+        self.current = np.array(base, dtype=np.float64)
+        self.reachable = np.isfinite(base)
+        np.fill_diagonal(self.reachable, False)
+        self.fluctuation = fluctuation
+        self.fluctuated = False
+
+    @classmethod
+    def from_matrix(cls, matrix, shortest_paths=False, cache_dir=None, fluctuation=2):
+        # With shortest_paths, non-adjacent pairs get their multi-hop travel time instead of np.inf
+        if not shortest_paths:
+            return cls(matrix, fluctuation)
+        if cache_dir is None:
+            distances, predecessors = all_pairs_shortest_paths(matrix)
+        else:
+            distances, predecessors = cached_shortest_paths(matrix, cache_dir)
+        return cls(distances, fluctuation, predecessors)
+
+    @property
+    def size(self):
+        return self.base.shape[0]
+
+    def path(self, start, end):
+        # Stops actually driven through between two consecutive route stops
+        if self.predecessors is None:
+            return [start, end] if np.isfinite(self.base[start, end]) else []
+        return reconstruct_path(self.predecessors, start, end)
+
+    def update(self, changes):
+        # changes is either a full replacement matrix or a sparse {(i, j): travel_time} mapping, applied to both
+        # directions. base is swapped for a new array rather than written to, since it may be shared or mapped.
+        # Returns the boolean matrix of pairs whose base travel time changed.
+        if self.predecessors is not None:
+            raise ValueError("Shortest-path travel times must be rebuilt with TravelTimeModel.from_matrix")
+        if isinstance(changes, dict):
+            base = np.array(self.base, dtype=np.float64)
+            for (start, end), travel_time in changes.items():
+                base[start, end] = base[end, start] = travel_time
+        else:
+            base = np.array(changes, dtype=np.float64)
+            if base.shape != self.base.shape:
+                raise ValueError(f"Updated matrix of shape {base.shape} does not match {self.base.shape}")
+        changed = base != self.base
+        self.base = base
+        self.reachable = np.isfinite(base)
+        np.fill_diagonal(self.reachable, False)
+        np.copyto(self.current, base)
+        self.fluctuated = False
+        return changed
+
+    def fluctuate(self):
+        size = self.size
+        bits = np.unpackbits(np.frombuffer(np.random.bytes((size * size + 7) // 8), dtype=np.uint8),
+                             count=size * size).reshape(size, size)
+        # bits ^ bits.T is symmetric with independent fair coins above the diagonal
+        steps = (bits ^ bits.T).view(np.int8) * np.int8(2 * self.fluctuation) - np.int8(self.fluctuation)
+        np.add(self.base, steps, out=self.current, where=self.reachable)
+        self.fluctuated = True
+
+    def reset(self):
+        if self.fluctuated:
+            np.copyto(self.current, self.base, where=self.reachable)
+            self.fluctuated = False
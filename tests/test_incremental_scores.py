@@ -0,0 +1,128 @@
+import random
+
+import numpy as np
+import pytest
+
+from GDVPS import GDVPS
+from chromosome import Chromosome
+from travel_times import random_travel_times
+
+
+def make_ga(seed, **kwargs):
+    # Every pair is reachable so route distances stay finite after mutation and can be compared
+    random.seed(seed)
+    np.random.seed(seed)
+    matrix = random_travel_times(201, mean=15, scale=5 / np.sqrt(2), low=1, integer=True)
+    return GDVPS(vehicles=5, locations=200, shifts=6, population_size=40, generations=10, heuristic_file=None,
+                 distance_matrix=matrix, **kwargs)
+
+
+def assert_scores_match(ga, population):
+    visits, _ = ga.score_population(population)
+    for individual, individual_visits in zip(population, visits):
+        assert individual.scored
+        np.testing.assert_array_equal(individual.visits, individual_visits)
+        assert individual.fitness == np.count_nonzero(individual_visits)
+
+
+def assert_distances_match(ga, population):
+    _, distances = ga.evaluate_population(population, with_distance=True)
+    _, route_distances = ga.score_population(population)
+    np.testing.assert_allclose(distances, route_distances.sum(axis=(1, 2)))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_crossover_and_mutation_keep_counters(seed):
+    ga = make_ga(seed)
+    fitness = ga.evaluate_population(ga.population)
+    children = []
+    for _ in range(20):
+        parent1, parent2 = ga.select_parents(fitness)
+        child = ga.crossover(parent1, parent2)
+        ga.mutate(child)
+        children.append(child)
+    assert all(child.scored for child in children)
+    ga.evaluate_population(children)
+    assert_scores_match(ga, children)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_run_keeps_counters(seed):
+    ga = make_ga(seed)
+    ga.run()
+    assert_scores_match(ga, ga.population + [ga.best_solution])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_distances_follow_fluctuations(seed):
+    # Subtotals from one fluctuated matrix must not be served under the next
+    ga = make_ga(seed)
+    ga.run()
+    for _ in range(2):
+        ga.fluctuate_travel_times()
+        assert_distances_match(ga, ga.population)
+
+
+def test_cache_hits_attach_counters():
+    ga = make_ga(0)
+    ga.evaluate_population(ga.population)
+    clones = [Chromosome(individual.routes.copy(), individual.times.copy(), individual.lengths.copy())
+              for individual in ga.population[:5]]
+    hits = ga.fitness_cache.hits
+    ga.evaluate_population(clones)
+    assert ga.fitness_cache.hits == hits + len(clones)
+    assert_scores_match(ga, clones)
+
+
+def slowdowns_along(ga, individual, factor=3):
+    # Slows every leg the individual's first vehicle drives, so repair has routes to cut
+    slowdowns = {}
+    for shift in range(ga.shifts):
+        route = individual.route(shift, 0).tolist()
+        for start, end in zip(route, route[1:]):
+            slowdowns[start, end] = ga.base_distance_matrix[start, end] * factor
+    return slowdowns
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_repair_keeps_counters(seed):
+    ga = make_ga(seed)
+    best_solution, _, _ = ga.run()
+    population = [individual.copy() for individual in ga.population]
+    changed = ga.travel_model.update(slowdowns_along(ga, best_solution))
+    assert ga.repair_population(population, changed) > 0
+    assert_scores_match(ga, population)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_replan_leaves_returned_plan_untouched(seed):
+    ga = make_ga(seed)
+    best_solution, best_fitness, _ = ga.run()
+    routes, times = best_solution.routes.copy(), best_solution.times.copy()
+    ga.replan(slowdowns_along(ga, best_solution), generations=5)
+    np.testing.assert_array_equal(best_solution.routes, routes)
+    np.testing.assert_array_equal(best_solution.times, times)
+    assert best_solution.fitness == best_fitness
+    assert_scores_match(ga, ga.population + [ga.best_solution])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_local_search_keeps_counters(seed):
+    ga = make_ga(seed, local_search=True)
+    ga.evaluate_population(ga.population)
+    population = [individual.copy() for individual in ga.population]
+    assert sum(ga.local_search.improve(individual) for individual in population) > 0
+    assert_scores_match(ga, population)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_extend_leaves_returned_plan_untouched(seed):
+    ga = make_ga(seed, local_search=True)
+    best_solution, best_fitness, _ = ga.run()
+    routes, times = best_solution.routes.copy(), best_solution.times.copy()
+    ga.extend(5)
+    np.testing.assert_array_equal(best_solution.routes, routes)
+    np.testing.assert_array_equal(best_solution.times, times)
+    assert best_solution.fitness == best_fitness
+    assert ga.best_solution.fitness == ga.best_fitness
+    assert_scores_match(ga, ga.population + [ga.best_solution])